@@ -1,23 +1,56 @@
-from fastapi import FastAPI, HTTPException, Response, Request, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Response, Request, UploadFile, File, Form, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 import os
 import mysql.connector
-from mysql.connector import Error
-import jwt
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 import secrets
-from datetime import datetime, timedelta
-from stellar_sdk import Keypair, Network, StrKey
-from stellar_sdk.exceptions import Ed25519PublicKeyInvalidError
+import hashlib
+import hmac
+import orjson
+import time
+from datetime import datetime
+from decimal import Decimal, ROUND_DOWN
+from stellar_sdk import Account, Asset, Keypair, Network, Payment, Server, StrKey, TransactionBuilder
+from stellar_sdk.exceptions import Ed25519PublicKeyInvalidError, NotFoundError
+from stellar_sdk.client.requests_client import RequestsClient
+from stellar_sdk.memo import TextMemo
 import base64
-import re
+import json
+import asyncio
+import functools
+import threading
+import itertools
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor, wait
+from cachetools import LRUCache, TTLCache
+
+try:
+    from .soroban_service import SorobanService
+except ImportError:
+    # Run directly from the backend directory (python main.py / uvicorn main:app)
+    from soroban_service import SorobanService
 
 load_dotenv()
 
-app = FastAPI()
+# Records go through a queue so the request thread never blocks on writing them out
+logger = logging.getLogger("carbon.api")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger.propagate = False
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+log_listener = QueueListener(log_queue, log_handler)
+logger.addHandler(QueueHandler(log_queue))
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads/projects", exist_ok=True)
@@ -42,12 +75,87 @@ DB_CONFIG = {
     "user": os.getenv("DB_USER", "root"),
     "password": os.getenv("DB_PASSWORD", ""),
     "database": os.getenv("DB_NAME", "stellar_db"),
+    "use_pure": False,  # Use the C extension for protocol and row decoding
+}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 25))
+# Seconds to wait for a pooled connection to free up before failing the request
+DB_POOL_WAIT = float(os.getenv("DB_POOL_WAIT", 5))
+
+# Shared connection pool, created on first use so the app can start without MySQL
+db_pool = None
+db_pool_lock = threading.Lock()
+
+# Categories and registries rarely change, so keep them in memory for a few minutes
+REFERENCE_QUERIES = {
+    "categories": "SELECT id, name FROM categories ORDER BY name",
+    "registries": "SELECT id, name, website FROM registries ORDER BY name",
 }
+reference_cache = TTLCache(maxsize=len(REFERENCE_QUERIES), ttl=300)
+reference_cache_lock = threading.Lock()
+
+# Marketplace listing, kept pre-serialized for a few seconds and cleared on project/asset changes
+projects_list_cache = TTLCache(maxsize=1, ttl=15)
+projects_list_cache_lock = threading.Lock()
+
+# Asset list and detail payloads, same for every caller; cleared when an asset is minted
+assets_cache = TTLCache(maxsize=1024, ttl=30)
+assets_cache_lock = threading.Lock()
+
+# Shared Horizon client so its keep-alive connections are reused across requests;
+# the pool is sized for the threadpool handlers hitting Horizon at once
+HORIZON_URL = "https://horizon-testnet.stellar.org"
+HORIZON_POOL_SIZE = int(os.getenv("HORIZON_POOL_SIZE", "32"))
+horizon_server = Server(horizon_url=HORIZON_URL, client=RequestsClient(pool_size=HORIZON_POOL_SIZE))
+
+# Buyer account sequence numbers, reused for a few seconds when building unsigned transactions
+account_sequence_cache = TTLCache(maxsize=1024, ttl=3)
+account_sequence_cache_lock = threading.Lock()
+
+# Asset rows for purchase/swap checks; a buyer hits purchase, atomic-swap and complete-swap back to back
+asset_record_cache = TTLCache(maxsize=1024, ttl=5)
+asset_record_cache_lock = threading.Lock()
+asset_record_locks = {}
+
+# Contract, owner and supply per asset for admin approvals; fixed once the asset is minted
+approval_asset_cache = TTLCache(maxsize=4096, ttl=300)
+approval_asset_cache_lock = threading.Lock()
+
+# Payment destination and memo per asset; both are fixed once the asset is minted
+payment_target_cache = LRUCache(maxsize=4096)
+payment_target_cache_lock = threading.Lock()
+
+STROOPS_PER_XLM = Decimal(10000000)
+
+# Soroban CLI wrapper, created on first use since it needs ADMIN_SECRET_KEY and the token WASM
+soroban_service_instance = None
+soroban_service_lock = threading.Lock()
+
+# Follow-up admin transactions; a single worker keeps them from racing on the admin sequence number
+soroban_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="soroban")
+# Seller-signed bulk approvals; kept off the admin queue so they never delay a swap's mint or payout,
+# and single-worker so two runs for one seller can't race on its sequence number
+seller_approval_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="seller-approve")
+
+# Upload limits
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_DOCUMENT_SIZE = 10 * 1024 * 1024  # 10MB
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for the other form fields in Content-Length
+
+# Temp document names only need to be unique, not unguessable: pid + per-process counter
+temp_upload_seq = itertools.count()
+
+# Writes uploaded documents to disk while the handler's DB round-trips run
+upload_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="upload")
 
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-this")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Recently verified JWT payloads keyed by token hash, so repeat requests skip verification
+jwt_cache = TTLCache(maxsize=10000, ttl=30)
+jwt_cache_lock = threading.Lock()
+
 # Stellar network configuration
 STELLAR_NETWORK = os.getenv("STELLAR_NETWORK", "TESTNET")
 NETWORK_PASSPHRASES = {
@@ -57,17 +165,356 @@ NETWORK_PASSPHRASES = {
 }
 NETWORK_PASSPHRASE = NETWORK_PASSPHRASES.get(STELLAR_NETWORK, Network.TESTNET_NETWORK_PASSPHRASE)
 
+# SEP-53 prefix that wallets (Freighter signMessage) prepend before hashing a message
+SIGNED_MESSAGE_PREFIX = b"Stellar Signed Message:\n"
+
+
+class WaitingConnectionPool(pooling.MySQLConnectionPool):
+    """MySQLConnectionPool that can wait for a checked-out connection to be handed back instead of failing at once"""
+    
+    def __init__(self, *args, **kwargs):
+        # Created first: the base __init__ fills the pool through add_connection
+        self._returned = threading.Condition()
+        super().__init__(*args, **kwargs)
+    
+    def add_connection(self, cnx=None):
+        # Also called by PooledMySQLConnection.close(), so a waiter wakes as soon as one is returned
+        super().add_connection(cnx)
+        with self._returned:
+            self._returned.notify()
+    
+    def get_connection_waiting(self, timeout: float):
+        """get_connection(), sleeping until a connection is returned when all are checked out"""
+        deadline = time.monotonic() + timeout
+        with self._returned:
+            while True:
+                try:
+                    return self.get_connection()
+                except PoolError:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise
+                    self._returned.wait(remaining)
+
 
 def get_db_connection():
-    """Create and return a database connection"""
+    """Return a pooled database connection (close() hands it back to the pool)"""
+    global db_pool
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
+        if db_pool is None:
+            with db_pool_lock:
+                if db_pool is None:
+                    db_pool = WaitingConnectionPool(
+                        pool_name="stellar",
+                        pool_size=DB_POOL_SIZE,
+                        pool_reset_session=True,
+                        **DB_CONFIG,
+                    )
+        return db_pool.get_connection_waiting(DB_POOL_WAIT)
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        logger.error("Error connecting to MySQL: %s", e)
         raise HTTPException(status_code=500, detail="Database connection failed")
 
 
+# Indexes backing the hot lookups: (table, index name, columns, unique)
+SCHEMA_INDEXES = [
+    ("users", "uq_users_wallet_address", ("wallet_address",), True),
+    ("users", "uq_users_username", ("username",), True),
+    ("users", "uq_users_email", ("email",), True),
+    ("projects", "idx_projects_issuer_id", ("issuer_id",), False),
+    ("projects", "idx_projects_category_id", ("category_id",), False),
+    ("assets", "idx_assets_project_frozen", ("project_id", "is_frozen"), False),
+    ("assets", "idx_assets_issuer_contract", ("asset_issuer_address", "contract_id"), False),
+    ("tokenization_requests", "idx_tr_status_id", ("status", "id"), False),
+]
+
+
+def ensure_indexes(cursor):
+    """Create any missing SCHEMA_INDEXES (MySQL has no CREATE INDEX IF NOT EXISTS)"""
+    cursor.execute("""
+        SELECT table_name, index_name, column_name
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+        ORDER BY table_name, index_name, seq_in_index
+    """)
+    index_columns = {}
+    for table_name, index_name, column_name in cursor.fetchall():
+        index_columns.setdefault((table_name, index_name), []).append(column_name)
+    existing = {(table, tuple(columns)) for (table, _), columns in index_columns.items()}
+    
+    for table, index_name, columns, unique in SCHEMA_INDEXES:
+        if (table, columns) in existing:
+            continue
+        try:
+            cursor.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {table} ({', '.join(columns)})"
+            )
+            logger.info("Created index %s on %s", index_name, table)
+        except Error as e:
+            logger.error("Could not create index %s on %s: %s", index_name, table, e)
+
+
+def ensure_schema():
+    """Create tables the API needs that are not part of the base schema dump"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        
+        # Sign-in nonces for wallets, kept apart from users so unregistered wallets need no user row
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS auth_nonces (
+                wallet_address VARCHAR(200) NOT NULL PRIMARY KEY,
+                nonce VARCHAR(255) NULL,
+                verified_at TIMESTAMP NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+        """)
+        
+        # Completed marketplace swaps
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS purchases (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                asset_id INT NOT NULL,
+                buyer_id INT NOT NULL,
+                seller_id INT NOT NULL,
+                amount_xlm DECIMAL(20, 7) NOT NULL,
+                tokens_purchased DECIMAL(20, 7) NOT NULL,
+                xlm_payment_hash VARCHAR(255),
+                token_transfer_hash VARCHAR(255),
+                seller_payment_hash VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (asset_id) REFERENCES assets(id),
+                FOREIGN KEY (buyer_id) REFERENCES users(user_id),
+                FOREIGN KEY (seller_id) REFERENCES users(user_id),
+                INDEX idx_buyer (buyer_id),
+                INDEX idx_seller (seller_id),
+                INDEX idx_asset (asset_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        
+        # Older versions gave every wallet that asked for a nonce a placeholder users row
+        # (temp_<timestamp>_<wallet[:8]>[_n], or temp_<wallet>). A users row now means registered,
+        # so drop the placeholders that never got past registration; those wallets sign in again
+        # and register normally. Rows that somehow own projects, requests or purchases are kept.
+        cursor.execute(r"""
+            DELETE FROM users
+            WHERE (username LIKE CONCAT('temp\_%\_', LEFT(wallet_address, 8), '%')
+                   OR username = CONCAT('temp_', wallet_address))
+                AND NOT EXISTS (SELECT 1 FROM projects p WHERE p.issuer_id = users.user_id)
+                AND NOT EXISTS (SELECT 1 FROM tokenization_requests t WHERE t.issuer_id = users.user_id)
+                AND NOT EXISTS (SELECT 1 FROM purchases b WHERE b.buyer_id = users.user_id OR b.seller_id = users.user_id)
+        """)
+        if cursor.rowcount:
+            logger.info("Removed %s placeholder user row(s) left by unfinished registrations", cursor.rowcount)
+        
+        # Manual admin approvals, which run in the background and are polled by id;
+        # pending_asset_id is set only while PENDING so one asset can't have two approvals in flight
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS admin_approvals (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                asset_id INT NOT NULL,
+                pending_asset_id INT NULL,
+                approval_amount DECIMAL(30, 0) NOT NULL,
+                status ENUM('PENDING', 'APPROVED', 'FAILED') NOT NULL DEFAULT 'PENDING',
+                error TEXT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FOREIGN KEY (asset_id) REFERENCES assets(id),
+                INDEX idx_asset (asset_id),
+                UNIQUE KEY uq_pending_asset (pending_asset_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+        """)
+        # Queued approvals live in this process's Soroban worker, so any still PENDING at startup
+        # were lost with the previous process; fail them so the asset can be approved again
+        cursor.execute("""
+            UPDATE admin_approvals
+            SET status = 'FAILED', error = 'Interrupted by a server restart', pending_asset_id = NULL
+            WHERE status = 'PENDING'
+        """)
+        if cursor.rowcount:
+            logger.warning("Marked %s interrupted admin approval(s) as failed", cursor.rowcount)
+        
+        # Per-category sequence for project identifiers, seeded from the existing projects
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'categories' AND column_name = 'next_project_seq'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("ALTER TABLE categories ADD COLUMN next_project_seq INT NOT NULL DEFAULT 0")
+            cursor.execute("""
+                UPDATE categories c
+                SET next_project_seq = (SELECT COUNT(*) FROM projects p WHERE p.category_id = c.id)
+            """)
+        
+        # Deployed token contract for approved tokenization requests
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'tokenization_requests' AND column_name = 'contract_address'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("ALTER TABLE tokenization_requests ADD COLUMN contract_address VARCHAR(255) NULL")
+        
+        # Supply in stroops, kept by MySQL so approvals read an exact integer
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'assets' AND column_name = 'total_supply_stroops'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""
+                ALTER TABLE assets
+                ADD COLUMN total_supply_stroops DECIMAL(27, 0) AS (total_supply * 10000000) STORED
+            """)
+        
+        ensure_indexes(cursor)
+        
+        connection.commit()
+    except (HTTPException, Error) as e:
+        logger.error("Schema setup failed: %s", e)
+    finally:
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
+
+
+@app.on_event("startup")
+def on_startup():
+    log_listener.start()
+    ensure_schema()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if soroban_service_instance is not None:
+        soroban_service_instance.close()
+    log_listener.stop()
+
+
+class InvalidTokenError(Exception):
+    """Raised when a JWT is malformed or its signature does not verify"""
+
+
+class ExpiredTokenError(InvalidTokenError):
+    """Raised when a JWT's exp claim is in the past"""
+
+
+def b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64url_decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+JWT_SECRET_BYTES = JWT_SECRET.encode()
+JWT_HEADER_SEGMENT = b64url_encode(orjson.dumps({"alg": JWT_ALGORITHM, "typ": "JWT"}))
+
+
+def encode_jwt(payload: dict) -> str:
+    """Sign payload as an HS256 JWT (HMAC via hashlib/OpenSSL, JSON via orjson)"""
+    signing_input = JWT_HEADER_SEGMENT + b"." + b64url_encode(orjson.dumps(payload))
+    signature = hmac.new(JWT_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + b64url_encode(signature)).decode()
+
+
+def decode_jwt(token: str) -> dict:
+    """Verify an HS256 JWT and return its payload; exp is required"""
+    try:
+        signing_input, _, signature_segment = token.encode("ascii").rpartition(b".")
+        header_segment, _, payload_segment = signing_input.partition(b".")
+        header = orjson.loads(b64url_decode(header_segment))
+        if not isinstance(header, dict) or header.get("alg") != JWT_ALGORITHM:
+            raise InvalidTokenError("Unsupported token header")
+        
+        expected_signature = hmac.new(JWT_SECRET_BYTES, signing_input, hashlib.sha256).digest()
+        if not hmac.compare_digest(expected_signature, b64url_decode(signature_segment)):
+            raise InvalidTokenError("Signature verification failed")
+        
+        payload = orjson.loads(b64url_decode(payload_segment))
+    except ValueError as e:  # bad base64, JSON or non-ASCII input
+        raise InvalidTokenError(str(e))
+    
+    if not isinstance(payload, dict) or not isinstance(payload.get("exp"), (int, float)):
+        raise InvalidTokenError("Token is missing the exp claim")
+    if payload["exp"] <= time.time():
+        raise ExpiredTokenError("Signature has expired")
+    
+    return payload
+
+
+def decode_auth_token(auth_token: str) -> dict:
+    """Decode and verify a JWT, reusing a cached payload while it is still unexpired"""
+    cache_key = hashlib.sha256(auth_token.encode()).digest()
+    with jwt_cache_lock:
+        payload = jwt_cache.get(cache_key)
+    
+    if payload is None:
+        payload = decode_jwt(auth_token)
+        with jwt_cache_lock:
+            jwt_cache[cache_key] = payload
+    elif payload["exp"] <= time.time():
+        raise ExpiredTokenError("Signature has expired")
+    
+    return payload
+
+
+def set_auth_cookie(response: Response, user_id: int, wallet_address: str, role: str):
+    """Issue a JWT (carrying the user's role) in the httpOnly auth cookie"""
+    now = int(time.time())
+    payload = {
+        "user_id": user_id,
+        "wallet_address": wallet_address,
+        "role": role,
+        "exp": now + JWT_EXPIRATION_HOURS * 3600,
+        "iat": now,
+    }
+    
+    token = encode_jwt(payload)
+    
+    # Set JWT in httpOnly cookie
+    response.set_cookie(
+        key="auth_token",
+        value=token,
+        httponly=True,
+        secure=False,  # Set to True in production with HTTPS
+        samesite="lax",
+        max_age=JWT_EXPIRATION_HOURS * 3600,
+    )
+
+
+def fetch_all_dicts(cursor) -> list:
+    """Fetch all rows from a tuple cursor as dicts keyed by column name"""
+    columns = cursor.column_names
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def orjson_default(obj):
+    """Encode DECIMAL columns the way jsonable_encoder does (int when integral, else float)"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode()
+    raise TypeError
+
+
+def encode_json(data) -> bytes:
+    """Serialize DB rows straight to JSON bytes with orjson (datetimes are handled natively)"""
+    return orjson.dumps(data, default=orjson_default)
+
+
+def json_response(data) -> Response:
+    """Return already-plain data as JSON, skipping FastAPI's jsonable_encoder pass"""
+    return Response(content=encode_json(data), media_type="application/json")
+
+
+def fetch_one_dict(cursor) -> Optional[dict]:
+    """Fetch one row from a tuple cursor as a dict keyed by column name"""
+    row = cursor.fetchone()
+    return dict(zip(cursor.column_names, row)) if row else None
+
+
 def get_authenticated_user(request: Request):
     """Extract and return authenticated user from JWT cookie"""
     auth_token = request.cookies.get("auth_token")
@@ -76,48 +523,275 @@ def get_authenticated_user(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     try:
-        payload = jwt.decode(auth_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_auth_token(auth_token)
         user_id = payload.get("user_id")
         wallet_address = payload.get("wallet_address")
         
         if not user_id or not wallet_address:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        return {"user_id": user_id, "wallet_address": wallet_address}
-    except jwt.ExpiredSignatureError:
+        # role is absent from tokens issued before it was added to the claims
+        return {"user_id": user_id, "wallet_address": wallet_address, "role": payload.get("role")}
+    except ExpiredTokenError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+def get_user_role(user: dict, connection=None) -> Optional[str]:
+    """Return the role claim from the JWT, looking it up in the DB only when it may be stale"""
+    # USER tokens are re-checked since the role can be upgraded from another session
+    if user.get("role") and user["role"] != "USER":
+        return user["role"]
+    
+    own_connection = connection is None
+    if own_connection:
+        connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT role FROM users WHERE user_id = %s", (user["user_id"],))
+        user_data = cursor.fetchone()
+        cursor.close()
+    finally:
+        if own_connection:
+            connection.close()
+    
+    return user_data.get("role") if user_data else None
+
+
+def get_reference_rows(name: str, connection=None, refresh: bool = False) -> list:
+    """Return categories/registries rows from the in-process cache, loading them on a miss"""
+    if not refresh:
+        with reference_cache_lock:
+            rows = reference_cache.get(name)
+        if rows is not None:
+            return rows
+    
+    own_connection = connection is None
+    if own_connection:
+        connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(REFERENCE_QUERIES[name])
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        if own_connection:
+            connection.close()
+    
+    with reference_cache_lock:
+        reference_cache[name] = rows
+    return rows
+
+
+def check_content_length(request: Request, max_size: int, too_large_detail: str):
+    """Reject early (413) when the declared request body cannot fit a max_size upload"""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413, detail=too_large_detail)
+
+
+def save_upload_file(upload: UploadFile, destination: str, max_size: int, too_large_detail: str):
+    """Stream an upload to disk in chunks, aborting as soon as it exceeds max_size bytes"""
+    written = 0
+    try:
+        with open(destination, "wb") as buffer:
+            while True:
+                chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise HTTPException(status_code=400, detail=too_large_detail)
+                buffer.write(chunk)
+    except BaseException:
+        # Don't leave partial files behind
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+    return written
+
+
+VOWEL_TABLE = str.maketrans("", "", "aeiouAEIOU")
+
+
+def invalidate_projects_list():
+    """Drop the cached /projects payload after projects or assets change"""
+    with projects_list_cache_lock:
+        projects_list_cache.clear()
+
+
+def invalidate_assets():
+    """Drop the cached /assets payloads and asset rows after assets change"""
+    with assets_cache_lock:
+        assets_cache.clear()
+    with asset_record_cache_lock:
+        asset_record_cache.clear()
+    with approval_asset_cache_lock:
+        approval_asset_cache.clear()
+
+
+def load_source_account(wallet_address: str) -> Account:
+    """Load an account for an unsigned transaction, reusing a sequence fetched in the last few seconds"""
+    with account_sequence_cache_lock:
+        sequence = account_sequence_cache.get(wallet_address)
+    if sequence is None:
+        sequence = horizon_server.load_account(wallet_address).sequence
+        with account_sequence_cache_lock:
+            account_sequence_cache[wallet_address] = sequence
+    # Fresh Account each time, since building a transaction bumps its sequence in place
+    return Account(wallet_address, sequence)
+
+
+def forget_account_sequence(wallet_address: str):
+    """Drop a cached sequence once the account is known to have submitted a transaction"""
+    with account_sequence_cache_lock:
+        account_sequence_cache.pop(wallet_address, None)
+
+
+# Asset with the project fields the purchase and swap endpoints check
+SQL_ASSET_WITH_PROJECT = """
+    SELECT 
+        a.id,
+        a.project_id,
+        a.asset_code,
+        a.contract_id,
+        a.asset_issuer_address,
+        a.price_per_ton,
+        a.total_supply,
+        a.is_frozen,
+        a.vintage_year,
+        p.issuer_id,
+        p.project_identifier,
+        p.name as project_name
+    FROM assets a
+    LEFT JOIN projects p ON a.project_id = p.id
+    WHERE a.id = %s
+"""
+
+
+def get_asset_with_project(asset_id: int) -> Optional[dict]:
+    """Asset row for purchase/swap checks, cached briefly; concurrent misses for one id share a query"""
+    with asset_record_cache_lock:
+        if asset_id in asset_record_cache:
+            return asset_record_cache[asset_id]
+        key_lock = asset_record_locks.setdefault(asset_id, threading.Lock())
+    
+    with key_lock:
+        try:
+            # Another request may have loaded it while we waited
+            with asset_record_cache_lock:
+                if asset_id in asset_record_cache:
+                    return asset_record_cache[asset_id]
+            
+            connection = get_db_connection()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(SQL_ASSET_WITH_PROJECT, (asset_id,))
+                asset = fetch_one_dict(cursor)
+                cursor.close()
+            finally:
+                connection.close()
+            
+            if asset:
+                with asset_record_cache_lock:
+                    asset_record_cache[asset_id] = asset
+            return asset
+        finally:
+            # Only needed while a load is in flight; keeping them would grow the dict per asset id
+            with asset_record_cache_lock:
+                asset_record_locks.pop(asset_id, None)
+
+
+# Where a buyer's XLM goes for an asset and the code used in its memo
+SQL_ASSET_PAYMENT_TARGET = "SELECT asset_issuer_address, asset_code FROM assets WHERE id = %s"
+
+
+def get_payment_target(asset_id: int) -> Optional[tuple]:
+    """Return (destination, memo_text, memo) for paying for an asset, or None if it does not exist"""
+    with payment_target_cache_lock:
+        target = payment_target_cache.get(asset_id)
+    if target is not None:
+        return target
+    
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(SQL_ASSET_PAYMENT_TARGET, (asset_id,))
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+    
+    if not row:
+        return None
+    
+    destination, asset_code = row
+    memo_text = f"Purchase {asset_code}"
+    target = (destination, memo_text, TextMemo(memo_text[:28]))  # Max 28 bytes
+    with payment_target_cache_lock:
+        payment_target_cache[asset_id] = target
+    return target
+
+
+def get_admin_keypair() -> Keypair:
+    """Admin signing keypair, decoded once by the Soroban service"""
+    return get_soroban_service().admin_keypair
+
+
+@functools.lru_cache(maxsize=2048)
+def swap_memo(prefix: str, asset_code: str) -> TextMemo:
+    """Memo for a swap transaction ("Buy"/"Pay" plus the asset code), truncated to the 28-byte limit"""
+    return TextMemo(f"{prefix} {asset_code}"[:28])
+
+
+def get_soroban_service() -> SorobanService:
+    """Return the shared SorobanService, creating it on first use"""
+    global soroban_service_instance
+    if soroban_service_instance is None:
+        with soroban_service_lock:
+            if soroban_service_instance is None:
+                soroban_service_instance = SorobanService()
+    return soroban_service_instance
+
+
 def remove_vowels(text: str) -> str:
     """Remove all vowels (a, e, i, o, u) case-insensitively and return uppercase"""
-    return re.sub(r'[aeiouAEIOU]', '', text).upper()
+    return text.translate(VOWEL_TABLE).upper()
 
 
 def generate_project_identifier(category_id: int, connection) -> str:
     """Generate unique project identifier based on category"""
-    cursor = connection.cursor(dictionary=True)
-    
-    # Get category name
-    cursor.execute("SELECT name FROM categories WHERE id = %s", (category_id,))
-    category = cursor.fetchone()
+    # Get category name from the cached list, reloading once in case it was just added
+    category_name = None
+    for refresh in (False, True):
+        categories = get_reference_rows("categories", connection, refresh=refresh)
+        category_name = next((c["name"] for c in categories if c["id"] == category_id), None)
+        if category_name is not None:
+            break
     
-    if not category:
+    if category_name is None:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    category_name = category["name"]
-    
     # Remove vowels and uppercase
     consonants = remove_vowels(category_name)
     
-    # Count existing projects with same category_id
-    cursor.execute("SELECT COUNT(*) as count FROM projects WHERE category_id = %s", (category_id,))
+    # Take the next number from the category's counter; the row lock taken by the
+    # UPDATE is held until the caller commits, so concurrent creates can't collide
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute(
+        "UPDATE categories SET next_project_seq = next_project_seq + 1 WHERE id = %s",
+        (category_id,)
+    )
+    cursor.execute("SELECT next_project_seq FROM categories WHERE id = %s", (category_id,))
     result = cursor.fetchone()
-    count = result["count"] if result else 0
     
-    # Generate identifier: CONSONANTS-(count+1)
-    project_identifier = f"{consonants}-{count + 1}"
+    if not result:
+        cursor.close()
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    # Generate identifier: CONSONANTS-seq
+    project_identifier = f"{consonants}-{result['next_project_seq']}"
     
     cursor.close()
     return project_identifier
@@ -151,17 +825,15 @@ def read_root():
 
 
 @app.post("/auth/nonce")
-async def get_nonce(request: NonceRequest):
+def get_nonce(request: NonceRequest):
     """
     Generate and store a nonce for the given wallet address.
     Returns the nonce that needs to be signed.
     """
     public_key = request.publicKey.strip()
     
-    # Validate Stellar public key format
-    try:
-        Keypair.from_public_key(public_key)
-    except Ed25519PublicKeyInvalidError:
+    # Validate Stellar public key format (checksum only; no Keypair needed here)
+    if not StrKey.is_valid_ed25519_public_key(public_key):
         raise HTTPException(status_code=400, detail="Invalid Stellar public key format")
     
     # Generate a random nonce
@@ -172,43 +844,11 @@ async def get_nonce(request: NonceRequest):
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Check if user exists
-        cursor.execute(
-            "SELECT user_id, current_nonce FROM users WHERE wallet_address = %s",
-            (public_key,)
-        )
-        user = cursor.fetchone()
-        
-        if user:
-            # Update existing user's nonce
-            cursor.execute(
-                "UPDATE users SET current_nonce = %s WHERE wallet_address = %s",
-                (nonce, public_key)
-            )
-        else:
-            # Store nonce temporarily - need to provide a temporary username since it's NOT NULL
-            # Use a unique temporary username that will be replaced during registration
-            # Format: temp_<timestamp>_<first8chars_of_wallet>
-            import time
-            temp_username = f"temp_{int(time.time())}_{public_key[:8]}"
-            
-            # Ensure temp username is unique (very unlikely to conflict, but check anyway)
-            counter = 0
-            while True:
-                cursor.execute("SELECT user_id FROM users WHERE username = %s", (temp_username,))
-                if not cursor.fetchone():
-                    break
-                temp_username = f"temp_{int(time.time())}_{public_key[:8]}_{counter}"
-                counter += 1
-                if counter > 1000:
-                    # Fallback: use full wallet address as temp username
-                    temp_username = f"temp_{public_key}"
-                    break
-            
-            cursor.execute(
-                "INSERT INTO users (wallet_address, username, current_nonce) VALUES (%s, %s, %s)",
-                (public_key, temp_username, nonce)
-            )
+        # Nonces live in their own table so unregistered wallets don't need a users row
+        cursor.execute("""
+            INSERT INTO auth_nonces (wallet_address, nonce) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE nonce = VALUES(nonce), verified_at = NULL, created_at = CURRENT_TIMESTAMP
+        """, (public_key, nonce))
         
         connection.commit()
         return {"nonce": nonce}
@@ -216,16 +856,18 @@ async def get_nonce(request: NonceRequest):
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate nonce")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.post("/auth/freighter/verify")
-async def verify_signature(request: VerifyRequest, response: Response):
+def verify_signature(request: VerifyRequest, response: Response):
     """
     Verify the signature, check nonce, and issue JWT token.
     Sets JWT in httpOnly cookie.
@@ -249,75 +891,58 @@ async def verify_signature(request: VerifyRequest, response: Response):
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Get user and stored nonce
-        cursor.execute(
-            "SELECT user_id, current_nonce FROM users WHERE wallet_address = %s",
-            (public_key,)
-        )
-        user = cursor.fetchone()
-        
-        if not user:
+        # Get stored nonce together with the user row (if registered)
+        cursor.execute("""
+            SELECT n.nonce, u.user_id, u.username, u.email, u.role
+            FROM auth_nonces n
+            LEFT JOIN users u ON u.wallet_address = n.wallet_address
+            WHERE n.wallet_address = %s
+        """, (public_key,))
+        nonce_record = cursor.fetchone()
+        
+        if not nonce_record:
             raise HTTPException(status_code=404, detail="Nonce not found. Please request a new nonce.")
         
-        stored_nonce = user.get("current_nonce")
+        stored_nonce = nonce_record.get("nonce")
         
         if not stored_nonce or stored_nonce != nonce:
             raise HTTPException(status_code=401, detail="Invalid or expired nonce")
         
-        # Verify signature using Stellar SDK's built-in method
-        # verify_message() handles the "Stellar Signed Message:\n" prefix and SHA-256 hashing internally
+        # Verify the SEP-53 signed-message signature: ed25519 over
+        # SHA-256("Stellar Signed Message:\n" + nonce), same as Keypair.verify_message()
         try:
             # Decode the base64 signature
             signature_bytes = base64.b64decode(signature)
             
-            # Use Stellar SDK's verify_message - it handles everything internally
-            # Just pass the original nonce string (exactly as sent to signMessage on frontend)
-            keypair.verify_message(nonce, signature_bytes)
+            # Hash the original nonce string (exactly as sent to signMessage on frontend)
+            message_hash = hashlib.sha256(SIGNED_MESSAGE_PREFIX + nonce.encode()).digest()
+            keypair.verify(message_hash, signature_bytes)
             
-            print("Signature verification successful!")
+            logger.debug("Signature verification successful!")
             
         except Exception as e:
-            print(f"Signature verification failed: {type(e).__name__}: {e}")
+            logger.warning("Signature verification failed: %s: %s", type(e).__name__, e)
             raise HTTPException(status_code=401, detail="Invalid signature")
         
-        # Clear the nonce after successful verification
+        # Consume the nonce and remember the wallet was verified (needed to complete registration).
+        # Matching on the nonce makes this the single write on this path and stops a
+        # concurrent request from reusing the same nonce.
         cursor.execute(
-            "UPDATE users SET current_nonce = NULL WHERE wallet_address = %s",
-            (public_key,)
+            "UPDATE auth_nonces SET nonce = NULL, verified_at = CURRENT_TIMESTAMP WHERE wallet_address = %s AND nonce = %s",
+            (public_key, nonce)
         )
+        if cursor.rowcount == 0:
+            connection.rollback()
+            raise HTTPException(status_code=401, detail="Invalid or expired nonce")
         connection.commit()
         
-        # Get full user data including username to check registration status
-        cursor.execute(
-            "SELECT user_id, username, email FROM users WHERE wallet_address = %s",
-            (public_key,)
-        )
-        full_user = cursor.fetchone()
-        
-        # Check if user registration is complete (has non-temporary username)
-        username = full_user.get("username") if full_user else None
-        is_registered = username is not None and not username.startswith("temp_")
+        # Wallets only get a users row once registration is complete
+        full_user = nonce_record if nonce_record.get("user_id") is not None else None
+        is_registered = full_user is not None
         
         if is_registered:
             # User is fully registered, issue JWT
-            payload = {
-                "user_id": full_user["user_id"],
-                "wallet_address": public_key,
-                "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
-                "iat": datetime.utcnow(),
-            }
-            
-            token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-            
-            # Set JWT in httpOnly cookie
-            response.set_cookie(
-                key="auth_token",
-                value=token,
-                httponly=True,
-                secure=False,  # Set to True in production with HTTPS
-                samesite="lax",
-                max_age=JWT_EXPIRATION_HOURS * 3600,
-            )
+            set_auth_cookie(response, full_user["user_id"], public_key, full_user.get("role") or "USER")
             
             return {
                 "success": True,
@@ -335,7 +960,7 @@ async def verify_signature(request: VerifyRequest, response: Response):
                 "message": "Wallet verified. Please complete registration.",
                 "wallet_address": public_key,
                 "registered": False,
-                "user_id": full_user["user_id"] if full_user else None,
+                "user_id": None,
             }
         
     except HTTPException:
@@ -343,19 +968,21 @@ async def verify_signature(request: VerifyRequest, response: Response):
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.post("/auth/check-availability")
-async def check_availability(request: CheckAvailabilityRequest):
+def check_availability(request: CheckAvailabilityRequest):
     """
     Check if username or email is available (not already taken).
     """
@@ -364,35 +991,46 @@ async def check_availability(request: CheckAvailabilityRequest):
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        results = {}
-        
+        # Check both fields in a single round-trip; comparisons stay in SQL so the
+        # column collation decides what counts as "taken"
+        fields = {}
         if request.username:
-            cursor.execute(
-                "SELECT user_id FROM users WHERE username = %s",
-                (request.username.strip(),)
-            )
-            results["username_available"] = cursor.fetchone() is None
-        
+            fields["username"] = request.username.strip()
         if request.email:
-            cursor.execute(
-                "SELECT user_id FROM users WHERE email = %s",
-                (request.email.strip(),)
-            )
-            results["email_available"] = cursor.fetchone() is None
+            fields["email"] = request.email.strip()
+        
+        if not fields:
+            return {}
+        
+        select_parts = [f"MAX({column} = %s) AS {column}_taken" for column in fields]
+        where_parts = [f"{column} = %s" for column in fields]
+        values = tuple(fields.values())
+        
+        cursor.execute(
+            f"SELECT {', '.join(select_parts)} FROM users WHERE {' OR '.join(where_parts)}",
+            values + values
+        )
+        row = cursor.fetchone()
+        
+        results = {}
+        for column in fields:
+            results[f"{column}_available"] = not row[f"{column}_taken"]
         
         return results
         
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.post("/auth/complete-registration")
-async def complete_registration(request: CompleteRegistrationRequest, response: Response):
+def complete_registration(request: CompleteRegistrationRequest, response: Response):
     """
     Complete user registration by adding username and email.
     Verifies that the wallet_address exists and is not already registered.
@@ -413,25 +1051,28 @@ async def complete_registration(request: CompleteRegistrationRequest, response:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Check if wallet exists
+        # Check if already registered
         cursor.execute(
-            "SELECT user_id, username, email FROM users WHERE wallet_address = %s",
+            "SELECT user_id FROM users WHERE wallet_address = %s",
             (wallet_address,)
         )
-        user = cursor.fetchone()
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="User is already registered")
         
-        if not user:
-            raise HTTPException(status_code=404, detail="Wallet not found. Please connect your wallet first.")
+        # Check that the wallet signed a nonce via /auth/freighter/verify
+        cursor.execute(
+            "SELECT verified_at FROM auth_nonces WHERE wallet_address = %s",
+            (wallet_address,)
+        )
+        nonce_record = cursor.fetchone()
         
-        # Check if already registered (username doesn't start with "temp_")
-        current_username = user.get("username", "")
-        if current_username and not current_username.startswith("temp_"):
-            raise HTTPException(status_code=400, detail="User is already registered")
+        if not nonce_record or not nonce_record.get("verified_at"):
+            raise HTTPException(status_code=404, detail="Wallet not found. Please connect your wallet first.")
         
-        # Check if username is already taken (by another user)
+        # Check if username is already taken
         cursor.execute(
-            "SELECT user_id FROM users WHERE username = %s AND wallet_address != %s",
-            (username, wallet_address)
+            "SELECT user_id FROM users WHERE username = %s",
+            (username,)
         )
         if cursor.fetchone():
             raise HTTPException(status_code=400, detail="Username is already taken")
@@ -439,43 +1080,31 @@ async def complete_registration(request: CompleteRegistrationRequest, response:
         # Check if email is already taken (if provided)
         if email:
             cursor.execute(
-                "SELECT user_id FROM users WHERE email = %s AND wallet_address != %s",
-                (email, wallet_address)
+                "SELECT user_id FROM users WHERE email = %s",
+                (email,)
             )
             if cursor.fetchone():
                 raise HTTPException(status_code=400, detail="Email is already taken")
         
-        # Update user with username and email
+        # Create the user and drop the verification record
         cursor.execute(
-            "UPDATE users SET username = %s, email = %s WHERE wallet_address = %s",
-            (username, email, wallet_address)
+            "INSERT INTO users (wallet_address, username, email) VALUES (%s, %s, %s)",
+            (wallet_address, username, email)
+        )
+        user_id = cursor.lastrowid
+        cursor.execute(
+            "DELETE FROM auth_nonces WHERE wallet_address = %s",
+            (wallet_address,)
         )
         connection.commit()
         
-        # Generate JWT token
-        payload = {
-            "user_id": user["user_id"],
-            "wallet_address": wallet_address,
-            "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
-            "iat": datetime.utcnow(),
-        }
-        
-        token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-        
-        # Set JWT in httpOnly cookie
-        response.set_cookie(
-            key="auth_token",
-            value=token,
-            httponly=True,
-            secure=False,  # Set to True in production with HTTPS
-            samesite="lax",
-            max_age=JWT_EXPIRATION_HOURS * 3600,
-        )
+        # Generate JWT token (new users start with the default USER role)
+        set_auth_cookie(response, user_id, wallet_address, "USER")
         
         return {
             "success": True,
             "message": "Registration completed successfully",
-            "user_id": user["user_id"],
+            "user_id": user_id,
             "wallet_address": wallet_address,
             "username": username,
             "email": email,
@@ -486,12 +1115,14 @@ async def complete_registration(request: CompleteRegistrationRequest, response:
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.post("/auth/logout")
@@ -509,7 +1140,7 @@ async def logout(response: Response):
 
 
 @app.get("/auth/me")
-async def get_current_user(request: Request):
+def get_current_user(request: Request):
     """
     Get current authenticated user from JWT token in cookie.
     """
@@ -522,7 +1153,7 @@ async def get_current_user(request: Request):
     
     try:
         # Decode and verify JWT
-        payload = jwt.decode(auth_token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_auth_token(auth_token)
         user_id = payload.get("user_id")
         wallet_address = payload.get("wallet_address")
         
@@ -552,62 +1183,43 @@ async def get_current_user(request: Request):
                 "role": user.get("role", "USER"),
             }
         finally:
-            if connection and connection.is_connected():
-                cursor.close()
-                connection.close()
+            if connection:
+                try:
+                    cursor.close()
+                finally:
+                    connection.close()
                 
-    except jwt.ExpiredSignatureError:
+    except ExpiredTokenError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
 # Project endpoints
 @app.get("/projects/categories")
-async def get_categories():
+def get_categories():
     """Get all categories"""
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("SELECT id, name FROM categories ORDER BY name")
-        categories = cursor.fetchall()
-        
-        return categories
+        return get_reference_rows("categories")
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 
 @app.get("/projects/registries")
-async def get_registries():
+def get_registries():
     """Get all registries"""
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("SELECT id, name, website FROM registries ORDER BY name")
-        registries = cursor.fetchall()
-        
-        return registries
+        return get_reference_rows("registries")
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 
 @app.post("/projects/create")
-async def create_project(
+def create_project(
     request: Request,
+    response: Response,
     category_id: int = Form(...),
     registry_id: int = Form(...),
     name: str = Form(...),
@@ -626,14 +1238,23 @@ async def create_project(
     if image.content_type not in ["image/jpeg", "image/jpg", "image/png", "image/webp"]:
         raise HTTPException(status_code=400, detail="Invalid image type. Only JPEG, PNG, and WebP are allowed.")
     
-    # Check file size (5MB max)
-    image.file.seek(0, 2)  # Seek to end
-    file_size = image.file.tell()
-    image.file.seek(0)  # Reset to beginning
-    if file_size > 5 * 1024 * 1024:  # 5MB
-        raise HTTPException(status_code=400, detail="Image file too large. Maximum size is 5MB.")
+    # Check file size (5MB max) from the header; save_upload_file enforces the exact limit
+    check_content_length(request, MAX_IMAGE_SIZE, "Image file too large. Maximum size is 5MB.")
+    
+    # uploads/projects is created once at startup
+    uploads_dir = os.path.join("uploads", "projects")
+    
+    # Save image file under a random final name so the INSERT can store its URL directly.
+    # Done before touching the DB: the identifier's category row lock is then held only
+    # for the INSERT and commit, not for the file copy
+    file_extension = os.path.splitext(image.filename)[1]
+    image_filename = f"{secrets.token_urlsafe(16)}{file_extension}"
+    image_filepath = os.path.join(uploads_dir, image_filename)
+    
+    save_upload_file(image, image_filepath, MAX_IMAGE_SIZE, "Image file too large. Maximum size is 5MB.")
     
     connection = None
+    committed = False
     try:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
@@ -641,20 +1262,6 @@ async def create_project(
         # Generate project identifier
         project_identifier = generate_project_identifier(category_id, connection)
         
-        # Create uploads directory structure
-        uploads_dir = os.path.join("uploads", "projects")
-        os.makedirs(uploads_dir, exist_ok=True)
-        
-        # Save image file
-        file_extension = os.path.splitext(image.filename)[1]
-        # We'll use a temporary name first, then rename after getting project_id
-        temp_filename = f"temp_{secrets.token_urlsafe(8)}{file_extension}"
-        temp_filepath = os.path.join(uploads_dir, temp_filename)
-        
-        with open(temp_filepath, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
-        
         # Insert project into database
         # Use ST_GeomFromText for POINT type
         insert_query = """
@@ -667,38 +1274,30 @@ async def create_project(
         """
         
         point_wkt = f"POINT({longitude} {latitude})"
-        image_url = ""  # Will update after getting project_id
+        image_url = f"/uploads/projects/{image_filename}"
         
         cursor.execute(
             insert_query,
             (registry_id, category_id, project_identifier, name, user_id,
              description, country, point_wkt, image_url)
         )
-        connection.commit()
         
         # Get the inserted project_id
         project_id = cursor.lastrowid
         
-        # Rename image file with project_id
-        project_dir = os.path.join(uploads_dir, str(project_id))
-        os.makedirs(project_dir, exist_ok=True)
-        final_filename = f"{project_id}{file_extension}"
-        final_filepath = os.path.join(project_dir, final_filename)
-        os.rename(temp_filepath, final_filepath)
-        
-        # Update image_url in database
-        image_url = f"/uploads/projects/{project_id}/{final_filename}"
-        cursor.execute(
-            "UPDATE projects SET image_url = %s WHERE id = %s",
-            (image_url, project_id)
-        )
-        
         # Update user role to ISSUER if currently USER
         cursor.execute(
             "UPDATE users SET role = 'ISSUER' WHERE user_id = %s AND role = 'USER'",
             (user_id,)
         )
+        role_upgraded = cursor.rowcount > 0
         connection.commit()
+        committed = True
+        invalidate_projects_list()
+        
+        # Re-issue the cookie so the role claim reflects the upgrade
+        if role_upgraded:
+            set_auth_cookie(response, user_id, user["wallet_address"], "ISSUER")
         
         # Fetch created project with category and registry names
         cursor.execute("""
@@ -722,21 +1321,26 @@ async def create_project(
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         if connection:
             connection.rollback()
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        # No project row points at the image unless the INSERT was committed
+        if not committed and os.path.exists(image_filepath):
+            os.remove(image_filepath)
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.get("/projects/my-projects")
-async def get_my_projects(request: Request):
+def get_my_projects(request: Request):
     """Get all projects for the current authenticated user"""
     user = get_authenticated_user(request)
     user_id = user["user_id"]
@@ -744,7 +1348,8 @@ async def get_my_projects(request: Request):
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        # Tuple cursor: the C extension decodes rows without building a dict per row
+        cursor = connection.cursor()
         
         cursor.execute("""
             SELECT 
@@ -769,28 +1374,36 @@ async def get_my_projects(request: Request):
             ORDER BY p.id DESC
         """, (user_id,))
         
-        projects = cursor.fetchall()
+        projects = fetch_all_dicts(cursor)
         
-        return projects
+        return json_response(projects)
         
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.get("/projects")
-async def get_all_projects(request: Request):
+def get_all_projects(request: Request):
     """Get all projects (for marketplace)"""
     get_authenticated_user(request)  # Just check authentication
     
+    with projects_list_cache_lock:
+        cached_body = projects_list_cache.get("all")
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        # Tuple cursor: the C extension decodes rows without building a dict per row
+        cursor = connection.cursor()
         
         cursor.execute("""
             SELECT 
@@ -815,21 +1428,27 @@ async def get_all_projects(request: Request):
             ORDER BY p.id DESC
         """)
         
-        projects = cursor.fetchall()
+        projects = fetch_all_dicts(cursor)
+        
+        body = encode_json(projects)
+        with projects_list_cache_lock:
+            projects_list_cache["all"] = body
         
-        return projects
+        return Response(content=body, media_type="application/json")
         
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 @app.get("/projects/{project_id}")
-async def get_project(request: Request, project_id: int):
+def get_project(request: Request, project_id: int):
     """Get a single project by ID with its assets"""
     get_authenticated_user(request)  # Just check authentication
     
@@ -838,13 +1457,31 @@ async def get_project(request: Request, project_id: int):
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        # Get project details with latitude and longitude from POINT geometry
+        # Get project details with latitude and longitude from POINT geometry,
+        # and its assets aggregated into a JSON array in the same round-trip
         cursor.execute("""
             SELECT p.id, p.project_identifier, p.name, p.description, p.country, p.image_url,
                    p.issuer_id, c.name as category_name, r.name as registry_name,
                    u.username as issuer_username,
                    ST_X(p.location_geo) as longitude,
-                   ST_Y(p.location_geo) as latitude
+                   ST_Y(p.location_geo) as latitude,
+                   (
+                       SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                           'id', a.id,
+                           'project_id', a.project_id,
+                           'vintage_year', a.vintage_year,
+                           'asset_code', a.asset_code,
+                           'asset_issuer_address', a.asset_issuer_address,
+                           'contract_id', a.contract_id,
+                           'is_frozen', a.is_frozen,
+                           'total_supply', a.total_supply,
+                           'price_per_ton', a.price_per_ton,
+                           'origin_request_id', a.origin_request_id,
+                           'created_at', DATE_FORMAT(a.created_at, '%%Y-%%m-%%dT%%H:%%i:%%s')
+                       ))
+                       FROM assets a
+                       WHERE a.project_id = p.id
+                   ) as assets_json
             FROM projects p
             LEFT JOIN categories c ON p.category_id = c.id
             LEFT JOIN registries r ON p.registry_id = r.id
@@ -857,26 +1494,10 @@ async def get_project(request: Request, project_id: int):
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        # Get assets for this project
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.project_id,
-                a.vintage_year,
-                a.asset_code,
-                a.asset_issuer_address,
-                a.contract_id,
-                a.is_frozen,
-                a.total_supply,
-                a.price_per_ton,
-                a.origin_request_id,
-                a.created_at
-            FROM assets a
-            WHERE a.project_id = %s
-            ORDER BY a.vintage_year DESC, a.created_at DESC
-        """, (project_id,))
-        
-        assets = cursor.fetchall()
+        # JSON_ARRAYAGG has no ORDER BY, so sort newest vintage / newest asset first here
+        assets_json = project.pop("assets_json")
+        assets = json.loads(assets_json) if assets_json else []
+        assets.sort(key=lambda a: (a["vintage_year"], a["created_at"] or ""), reverse=True)
         
         project["assets"] = assets
         
@@ -885,17 +1506,19 @@ async def get_project(request: Request, project_id: int):
     except HTTPException:
         raise
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 # Tokenization endpoints
 @app.post("/tokenization/create")
-async def create_tokenization_request(
+def create_tokenization_request(
     request: Request,
     project_id: int = Form(...),
     vintage_year: int = Form(...),
@@ -910,42 +1533,22 @@ async def create_tokenization_request(
     user = get_authenticated_user(request)
     user_id = user["user_id"]
     
-    # Validate that user is an ISSUER
+    # Check file size (10MB max) from the declared body length before reading it
+    check_content_length(request, MAX_DOCUMENT_SIZE, "Document file too large. Maximum size is 10MB.")
+    
     connection = None
     try:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
         
-        cursor.execute(
-            "SELECT role FROM users WHERE user_id = %s",
-            (user_id,)
-        )
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data.get("role") != "ISSUER":
+        # Validate that user is an ISSUER (from the JWT role claim)
+        if get_user_role(user, connection) != "ISSUER":
             raise HTTPException(status_code=403, detail="Only issuers can create tokenization requests")
         
-        # Validate that project belongs to the user
-        cursor.execute(
-            "SELECT id FROM projects WHERE id = %s AND issuer_id = %s",
-            (project_id, user_id)
-        )
-        project = cursor.fetchone()
-        
-        if not project:
-            raise HTTPException(status_code=404, detail="Project not found or you don't have permission to use it")
-        
         # Validate PDF file
         if proof_document.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Invalid file type. Only PDF files are allowed.")
         
-        # Check file size (10MB max)
-        proof_document.file.seek(0, 2)  # Seek to end
-        file_size = proof_document.file.tell()
-        proof_document.file.seek(0)  # Reset to beginning
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(status_code=400, detail="Document file too large. Maximum size is 10MB.")
-        
         # Validate quantity
         try:
             quantity_decimal = float(quantity)
@@ -969,72 +1572,74 @@ async def create_tokenization_request(
         if vintage_year < 2000 or vintage_year > current_year:
             raise HTTPException(status_code=400, detail=f"Vintage year must be between 2000 and {current_year}")
         
-        # Create uploads directory structure
+        # uploads/documents is created once at startup
         uploads_dir = os.path.join("uploads", "documents")
-        os.makedirs(uploads_dir, exist_ok=True)
         
-        # Save document file
-        file_extension = os.path.splitext(proof_document.filename)[1] or ".pdf"
-        # Use a temporary name first, then rename after getting request_id
-        temp_filename = f"temp_{secrets.token_urlsafe(8)}{file_extension}"
+        # Save document file under a temporary name, renamed to {request_id}.pdf once the id is known
+        temp_filename = f"temp_{os.getpid()}_{next(temp_upload_seq)}.pdf"
         temp_filepath = os.path.join(uploads_dir, temp_filename)
         
-        with open(temp_filepath, "wb") as buffer:
-            content = await proof_document.read()
-            buffer.write(content)
+        save_future = upload_executor.submit(
+            save_upload_file, proof_document, temp_filepath, MAX_DOCUMENT_SIZE,
+            "Document file too large. Maximum size is 10MB."
+        )
         
-        # Insert tokenization request into database
-        proof_document_url = ""  # Will update after getting request_id
+        # Insert tokenization request into database; the document URL is derived from the id when read
+        proof_document_url = ""
         
+        # Insert only if the project belongs to the user, so ownership is checked in the same statement
         insert_query = """
             INSERT INTO tokenization_requests (
                 issuer_id, project_id, vintage_year, quantity, price_per_ton,
                 serial_number_start, serial_number_end, proof_document_url
-            ) VALUES (
-                %s, %s, %s, %s, %s, %s, %s, %s
             )
+            SELECT %s, p.id, %s, %s, %s, %s, %s, %s
+            FROM projects p
+            WHERE p.id = %s AND p.issuer_id = %s
         """
         
-        cursor.execute(
-            insert_query,
-            (user_id, project_id, vintage_year, quantity_decimal, price_per_ton_decimal,
-             serial_number_start if serial_number_start else None,
-             serial_number_end if serial_number_end else None,
-             proof_document_url)
-        )
-        connection.commit()
+        serial_number_start = serial_number_start if serial_number_start else None
+        serial_number_end = serial_number_end if serial_number_end else None
+        try:
+            cursor.execute(
+                insert_query,
+                (user_id, vintage_year, quantity_decimal, price_per_ton_decimal,
+                 serial_number_start, serial_number_end, proof_document_url,
+                 project_id, user_id)
+            )
+            # The INSERT is still uncommitted, so a failed write (e.g. too large) is rolled back
+            save_future.result()
+        except BaseException:
+            connection.rollback()
+            wait([save_future])
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+            raise
+        
+        if cursor.rowcount == 0:
+            os.remove(temp_filepath)
+            raise HTTPException(status_code=404, detail="Project not found or you don't have permission to use it")
         
         # Get the inserted request_id
         request_id = cursor.lastrowid
         
-        # Rename document file with request_id
-        final_filename = f"{request_id}{file_extension}"
-        final_filepath = os.path.join(uploads_dir, final_filename)
-        os.rename(temp_filepath, final_filepath)
+        # Rename document file with request_id before committing, so a committed row always has its file
+        os.rename(temp_filepath, os.path.join(uploads_dir, f"{request_id}.pdf"))
         
-        # Update proof_document_url in database
-        proof_document_url = f"/uploads/documents/{final_filename}"
-        cursor.execute(
-            "UPDATE tokenization_requests SET proof_document_url = %s WHERE id = %s",
-            (proof_document_url, request_id)
-        )
         connection.commit()
         
-        # Fetch created request
-        cursor.execute("""
-            SELECT tr.id, tr.vintage_year, tr.quantity, tr.status,
-                   tr.serial_number_start, tr.serial_number_end,
-                   p.project_identifier, p.name as project_name
-            FROM tokenization_requests tr
-            LEFT JOIN projects p ON tr.project_id = p.id
-            WHERE tr.id = %s
-        """, (request_id,))
-        tokenization_request = cursor.fetchone()
-        
         return {
             "success": True,
             "message": "Tokenization request created successfully",
-            "request": tokenization_request
+            "request": {
+                "id": request_id,
+                "project_id": project_id,
+                "vintage_year": vintage_year,
+                "quantity": quantity_decimal,
+                "status": "PENDING",
+                "serial_number_start": serial_number_start,
+                "serial_number_end": serial_number_end,
+            }
         }
         
     except HTTPException:
@@ -1042,92 +1647,130 @@ async def create_tokenization_request(
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         if connection:
             connection.rollback()
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="Internal server error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 # Admin endpoints
-def check_admin_role(request: Request):
-    """Check if user is authenticated and has ADMIN role"""
-    user = get_authenticated_user(request)
-    user_id = user["user_id"]
+def require_admin(user: dict = Depends(get_authenticated_user)):
+    """Dependency: the authenticated user, provided they have the ADMIN role"""
     
-    connection = None
-    try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute(
-            "SELECT role FROM users WHERE user_id = %s",
-            (user_id,)
-        )
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data.get("role") != "ADMIN":
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
-        return user
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+    # Answered from the JWT role claim; only older tokens need a DB lookup
+    if get_user_role(user) != "ADMIN":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return user
+
+
+# Pending tokenization requests, keyset-paginated on idx_tr_status_id
+SQL_PENDING_TOKENIZATION_REQUESTS = """
+    SELECT 
+        tr.id,
+        tr.vintage_year,
+        tr.quantity,
+        tr.serial_number_start,
+        tr.serial_number_end,
+        COALESCE(NULLIF(tr.proof_document_url, ''), CONCAT('/uploads/documents/', tr.id, '.pdf'))
+            as proof_document_url,
+        tr.status,
+        p.project_identifier,
+        p.name as project_name,
+        u.username as issuer_username,
+        u.wallet_address as issuer_wallet
+    FROM tokenization_requests tr
+    LEFT JOIN projects p ON tr.project_id = p.id
+    LEFT JOIN users u ON tr.issuer_id = u.user_id
+    WHERE tr.status = 'PENDING' AND (%s IS NULL OR tr.id < %s)
+    ORDER BY tr.id DESC
+    LIMIT %s
+"""
 
 
 @app.get("/admin/tokenization-requests")
-async def get_pending_tokenization_requests(request: Request):
-    """Get all pending tokenization requests (admin only)"""
-    check_admin_role(request)
-    
+def get_pending_tokenization_requests(
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    admin_user: dict = Depends(require_admin)
+):
+    """Get pending tokenization requests, newest first (admin only)"""
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
-        cursor.execute("""
-            SELECT 
-                tr.id,
-                tr.issuer_id,
-                tr.project_id,
-                tr.vintage_year,
-                tr.quantity,
-                tr.serial_number_start,
-                tr.serial_number_end,
-                tr.proof_document_url,
-                tr.status,
-                tr.admin_note,
-                p.project_identifier,
-                p.name as project_name,
-                u.username as issuer_username,
-                u.wallet_address as issuer_wallet
-            FROM tokenization_requests tr
-            LEFT JOIN projects p ON tr.project_id = p.id
-            LEFT JOIN users u ON tr.issuer_id = u.user_id
-            WHERE tr.status = 'PENDING'
-            ORDER BY tr.id DESC
-        """)
+        # Keyset pagination over idx_tr_status_id: pass the last id seen as before_id for the next page
+        cursor.execute(SQL_PENDING_TOKENIZATION_REQUESTS, (before_id, before_id, limit))
         
-        requests = cursor.fetchall()
+        requests = fetch_all_dicts(cursor)
         
-        return requests
+        return json_response(requests)
         
     except HTTPException:
         raise
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
+
+
+# The admin allowance covers 100x an asset's supply for safety
+APPROVAL_SUPPLY_MULTIPLIER = 100
+
+
+def approval_amount_for(total_supply) -> int:
+    """Admin allowance in stroops for a token with the given total supply (in tons), before it has an assets row"""
+    supply_stroops = int((Decimal(str(total_supply)) * STROOPS_PER_XLM).to_integral_value(rounding=ROUND_DOWN))
+    return supply_stroops * APPROVAL_SUPPLY_MULTIPLIER
+
+
+def auto_approve_admin(contract_address: str, issuer_wallet: str, quantity):
+    """Approve the admin to move a newly minted token on the issuer's behalf (runs in the background)"""
+    try:
+        approval_amount = approval_amount_for(quantity)
+        logger.debug("[APPROVE] Total supply: %s, approval amount (stroops): %s", quantity, approval_amount)
+        
+        # Approve admin for a very large amount
+        # This allows admin to transfer any amount on behalf of the issuer
+        # Since issuer is always admin, this will use admin's secret key to sign
+        logger.debug("[APPROVE] Calling approve_admin_for_token...")
+        approval_result = get_soroban_service().approve_admin_for_token(
+            token_contract_id=contract_address,
+            owner_address=issuer_wallet,  # This should be the same as admin
+            amount_i128=approval_amount,
+            expiration_ledger=None  # Will be calculated automatically (1 year from current ledger)
+        )
+        
+        if approval_result:
+            logger.debug("[APPROVE] ✓✓✓ Admin auto-approved successfully for token transfers ✓✓✓")
+            logger.debug("[APPROVE] Admin can now transfer tokens on behalf of issuer")
+        else:
+            logger.warning("[APPROVE] Approval returned False")
+            raise Exception("Approval returned False")
+    
+    except Exception as e:
+        logger.error("[APPROVE] ===== APPROVAL FAILED ======")
+        logger.error("[APPROVE] Failed to auto-approve admin: %s: %s", type(e).__name__, str(e))
+        logger.error("[APPROVE] This is CRITICAL - token transfers will fail without approval!")
+        logger.debug("[APPROVE] Contract is deployed and tokens are minted, but purchases will fail.")
+        logger.debug("Traceback:", exc_info=True)  # only formatted when DEBUG is on
+        # Don't fail the whole process, but this is a serious issue
+        logger.error("[APPROVE] ===== APPROVAL FAILED - CONTINUING ANYWAY ======")
 
 
 class ApproveRequestModel(BaseModel):
@@ -1135,43 +1778,38 @@ class ApproveRequestModel(BaseModel):
     admin_note: Optional[str] = None
 
 
+# Pending tokenization request with its project and issuer wallet
+SQL_TOKENIZATION_REQUEST_FOR_APPROVAL = """
+    SELECT 
+        tr.*,
+        p.project_identifier,
+        p.name as project_name,
+        u.wallet_address as issuer_wallet
+    FROM tokenization_requests tr
+    LEFT JOIN projects p ON tr.project_id = p.id
+    LEFT JOIN users u ON tr.issuer_id = u.user_id
+    WHERE tr.id = %s AND tr.status = 'PENDING'
+"""
+
+
 @app.post("/admin/tokenization-requests/approve")
-async def approve_tokenization_request(request: Request, approve_data: ApproveRequestModel):
+def approve_tokenization_request(approve_data: ApproveRequestModel, admin_user: dict = Depends(require_admin)):
     """Approve a tokenization request and deploy the contract (admin only)"""
-    admin_user = check_admin_role(request)
-    
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
         # Get the tokenization request
-        cursor.execute("""
-            SELECT 
-                tr.*,
-                p.project_identifier,
-                p.name as project_name,
-                u.wallet_address as issuer_wallet
-            FROM tokenization_requests tr
-            LEFT JOIN projects p ON tr.project_id = p.id
-            LEFT JOIN users u ON tr.issuer_id = u.user_id
-            WHERE tr.id = %s AND tr.status = 'PENDING'
-        """, (approve_data.request_id,))
-        
-        tokenization_request = cursor.fetchone()
+        cursor.execute(SQL_TOKENIZATION_REQUEST_FOR_APPROVAL, (approve_data.request_id,))
+        
+        tokenization_request = fetch_one_dict(cursor)
         
         if not tokenization_request:
             raise HTTPException(status_code=404, detail="Tokenization request not found or already processed")
         
-        # Import soroban service
-        import sys
-        import os
-        sys.path.append(os.path.dirname(__file__))
-        from soroban_service import SorobanService
-        
         try:
-            # Initialize soroban service
-            soroban_service = SorobanService()
+            soroban_service = get_soroban_service()
             
             # Deploy contract and register in carbon controller
             project_identifier = tokenization_request["project_identifier"]
@@ -1180,7 +1818,7 @@ async def approve_tokenization_request(request: Request, approve_data: ApproveRe
             issuer_wallet = tokenization_request["issuer_wallet"]
             quantity = tokenization_request["quantity"]  # Get quantity before using it
             
-            print(f"Deploying contract for project {project_identifier}, vintage {vintage_year}")
+            logger.info("Deploying contract for project %s, vintage %s", project_identifier, vintage_year)
             
             contract_address = soroban_service.deploy_and_register(
                 project_identifier=project_identifier,
@@ -1188,7 +1826,7 @@ async def approve_tokenization_request(request: Request, approve_data: ApproveRe
                 project_id=project_id,
                 admin_address=admin_user["wallet_address"],  # Admin is the contract admin
                 issuer_address=issuer_wallet,  # Issuer receives the minted tokens
-                quantity=float(quantity),  # Amount to mint
+                quantity=quantity,  # Amount to mint (DECIMAL column, scaled exactly by mint_to_issuer)
                 decimal=7
             )
             
@@ -1228,78 +1866,34 @@ async def approve_tokenization_request(request: Request, approve_data: ApproveRe
             ))
             
             # Update tokenization request status to MINTED and store contract address
-            # Note: If contract_address column doesn't exist, you may need to add it:
-            # ALTER TABLE tokenization_requests ADD COLUMN contract_address VARCHAR(255) NULL;
-            try:
-                cursor.execute("""
-                    UPDATE tokenization_requests 
-                    SET status = 'MINTED',
-                        admin_note = %s,
-                        contract_address = %s
-                    WHERE id = %s
-                """, (approve_data.admin_note, contract_address, approve_data.request_id))
-            except Error as e:
-                # If contract_address column doesn't exist, update without it
-                if "contract_address" in str(e).lower():
-                    cursor.execute("""
-                        UPDATE tokenization_requests 
-                        SET status = 'MINTED',
-                            admin_note = %s
-                        WHERE id = %s
-                    """, (f"{approve_data.admin_note or ''}\nContract: {contract_address}", approve_data.request_id))
-                else:
-                    raise
+            # (contract_address is added by ensure_schema; committed together with the asset row)
+            cursor.execute("""
+                UPDATE tokenization_requests 
+                SET status = 'MINTED',
+                    admin_note = %s,
+                    contract_address = %s
+                WHERE id = %s
+            """, (approve_data.admin_note, contract_address, approve_data.request_id))
             
             connection.commit()
+            invalidate_projects_list()
+            invalidate_assets()
             
             # Step 4: Auto-approve admin to transfer tokens on behalf of issuer
             # Since issuer is always admin in this system, this should always work
-            print(f"[APPROVE] ===== STEP 4: AUTO-APPROVING ADMIN ======")
-            print(f"[APPROVE] Issuer wallet: {issuer_wallet}")
-            print(f"[APPROVE] Admin wallet: {admin_user['wallet_address']}")
-            print(f"[APPROVE] Contract address: {contract_address}")
-            print(f"[APPROVE] Quantity: {quantity}")
+            logger.debug("[APPROVE] ===== STEP 4: AUTO-APPROVING ADMIN ======")
+            logger.debug("[APPROVE] Issuer wallet: %s", issuer_wallet)
+            logger.debug("[APPROVE] Admin wallet: %s", admin_user['wallet_address'])
+            logger.debug("[APPROVE] Contract address: %s", contract_address)
+            logger.debug("[APPROVE] Quantity: %s", quantity)
             
             # Verify issuer is admin
             if issuer_wallet != admin_user['wallet_address']:
-                print(f"[APPROVE] WARNING: Issuer ({issuer_wallet}) is not admin ({admin_user['wallet_address']})")
-                print(f"[APPROVE] This may cause approval to fail. Proceeding anyway...")
+                logger.warning("[APPROVE] Issuer (%s) is not admin (%s)", issuer_wallet, admin_user['wallet_address'])
+                logger.debug("[APPROVE] This may cause approval to fail. Proceeding anyway...")
             
-            try:
-                # Calculate total supply in smallest units (7 decimals)
-                total_supply_stroops = int(float(quantity) * 10000000)
-                approval_amount = total_supply_stroops * 100  # Approve 100x the supply for safety
-                
-                print(f"[APPROVE] Total supply (stroops): {total_supply_stroops}")
-                print(f"[APPROVE] Approval amount (stroops): {approval_amount}")
-                
-                # Approve admin for a very large amount
-                # This allows admin to transfer any amount on behalf of the issuer
-                # Since issuer is always admin, this will use admin's secret key to sign
-                print(f"[APPROVE] Calling approve_admin_for_token...")
-                approval_result = soroban_service.approve_admin_for_token(
-                    token_contract_id=contract_address,
-                    owner_address=issuer_wallet,  # This should be the same as admin
-                    amount_i128=approval_amount,
-                    expiration_ledger=None  # Will be calculated automatically (1 year from current ledger)
-                )
-                
-                if approval_result:
-                    print(f"[APPROVE] ✓✓✓ Admin auto-approved successfully for token transfers ✓✓✓")
-                    print(f"[APPROVE] Admin can now transfer tokens on behalf of issuer")
-                else:
-                    print(f"[APPROVE] WARNING: Approval returned False")
-                    raise Exception("Approval returned False")
-                    
-            except Exception as e:
-                print(f"[APPROVE] ===== APPROVAL FAILED ======")
-                print(f"[APPROVE] ERROR: Failed to auto-approve admin: {type(e).__name__}: {str(e)}")
-                print(f"[APPROVE] This is CRITICAL - token transfers will fail without approval!")
-                print(f"[APPROVE] Contract is deployed and tokens are minted, but purchases will fail.")
-                import traceback
-                traceback.print_exc()
-                # Don't fail the whole process, but this is a serious issue
-                print(f"[APPROVE] ===== APPROVAL FAILED - CONTINUING ANYWAY ======")
+            # Runs on the Soroban executor so the response doesn't wait for another ledger close
+            soroban_executor.submit(auto_approve_admin, contract_address, issuer_wallet, quantity)
             
             return {
                 "success": True,
@@ -1329,17 +1923,19 @@ async def approve_tokenization_request(request: Request, approve_data: ApproveRe
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
         if connection:
             connection.rollback()
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 class RejectRequestModel(BaseModel):
@@ -1348,10 +1944,8 @@ class RejectRequestModel(BaseModel):
 
 
 @app.post("/admin/tokenization-requests/reject")
-async def reject_tokenization_request(request: Request, reject_data: RejectRequestModel):
+def reject_tokenization_request(reject_data: RejectRequestModel, admin_user: dict = Depends(require_admin)):
     """Reject a tokenization request (admin only)"""
-    check_admin_role(request)
-    
     connection = None
     try:
         connection = get_db_connection()
@@ -1381,176 +1975,207 @@ async def reject_tokenization_request(request: Request, reject_data: RejectReque
     except Error as e:
         if connection:
             connection.rollback()
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 # Assets endpoints
+
+# Asset listing for the marketplace
+SQL_GET_ASSETS = """
+    SELECT 
+        a.id,
+        a.project_id,
+        a.vintage_year,
+        a.asset_code,
+        a.asset_issuer_address,
+        a.contract_id,
+        a.is_frozen,
+        a.total_supply,
+        a.origin_request_id,
+        a.created_at,
+        p.project_identifier,
+        p.name as project_name
+    FROM assets a
+    LEFT JOIN projects p ON a.project_id = p.id
+    ORDER BY a.created_at DESC
+"""
+
+
 @app.get("/assets")
-async def get_assets(request: Request):
+def get_assets(request: Request):
     """Get all assets (authenticated users)"""
     get_authenticated_user(request)  # Just check authentication
     
+    with assets_cache_lock:
+        cached_body = assets_cache.get("all")
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.project_id,
-                a.vintage_year,
-                a.asset_code,
-                a.asset_issuer_address,
-                a.contract_id,
-                a.is_frozen,
-                a.total_supply,
-                a.origin_request_id,
-                a.created_at,
-                p.project_identifier,
-                p.name as project_name
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            ORDER BY a.created_at DESC
-        """)
+        cursor.execute(SQL_GET_ASSETS)
         
-        assets = cursor.fetchall()
+        assets = fetch_all_dicts(cursor)
         
-        return assets
+        body = encode_json(assets)
+        with assets_cache_lock:
+            assets_cache["all"] = body
+        
+        return Response(content=body, media_type="application/json")
         
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
+
+
+# Single asset by id
+SQL_GET_ASSET = """
+    SELECT 
+        a.id,
+        a.project_id,
+        a.vintage_year,
+        a.asset_code,
+        a.asset_issuer_address,
+        a.contract_id,
+        a.is_frozen,
+        a.total_supply,
+        a.price_per_ton,
+        a.origin_request_id,
+        a.created_at,
+        p.project_identifier,
+        p.name as project_name
+    FROM assets a
+    LEFT JOIN projects p ON a.project_id = p.id
+    WHERE a.id = %s
+"""
 
 
 @app.get("/assets/{asset_id}")
-async def get_asset(request: Request, asset_id: int):
+def get_asset(request: Request, asset_id: int):
     """Get a specific asset by ID (authenticated users)"""
     get_authenticated_user(request)  # Just check authentication
     
+    with assets_cache_lock:
+        cached_body = assets_cache.get(asset_id)
+    if cached_body is not None:
+        return Response(content=cached_body, media_type="application/json")
+    
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.project_id,
-                a.vintage_year,
-                a.asset_code,
-                a.asset_issuer_address,
-                a.contract_id,
-                a.is_frozen,
-                a.total_supply,
-                a.price_per_ton,
-                a.origin_request_id,
-                a.created_at,
-                p.project_identifier,
-                p.name as project_name
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE a.id = %s
-        """, (asset_id,))
+        cursor.execute(SQL_GET_ASSET, (asset_id,))
         
-        asset = cursor.fetchone()
+        asset = fetch_one_dict(cursor)
         
         if not asset:
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        return asset
+        body = encode_json(asset)
+        with assets_cache_lock:
+            assets_cache[asset_id] = body
+        
+        return Response(content=body, media_type="application/json")
         
     except HTTPException:
         raise
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 class PurchaseAssetRequest(BaseModel):
     asset_id: int
-    amount_xlm: float  # Amount in XLM to pay
+    amount_xlm: Decimal  # Amount in XLM to pay
     buyer_address: str  # Stellar address of the buyer
+    
+    @property
+    def amount_stroops(self) -> int:
+        """amount_xlm in stroops, truncated to the 7 decimals XLM supports"""
+        return int((self.amount_xlm * STROOPS_PER_XLM).to_integral_value(rounding=ROUND_DOWN))
 
 
-class AtomicSwapRequest(BaseModel):
-    asset_id: int
-    amount_xlm: float  # Amount in XLM to pay
-    buyer_address: str  # Stellar address of the buyer
+class AtomicSwapRequest(PurchaseAssetRequest):
+    pass
+
+
+def compute_tokens_stroops(amount_xlm_stroops: int, price_per_ton: Optional[Decimal]) -> int:
+    """Tokens bought for an XLM amount, both in stroops, in exact integer math; 1:1 when no price is set"""
+    if price_per_ton and price_per_ton > 0:
+        return int((amount_xlm_stroops / Decimal(price_per_ton)).to_integral_value(rounding=ROUND_DOWN))
+    return amount_xlm_stroops
 
 
 @app.post("/assets/build-payment-xdr")
-async def build_payment_xdr(request: Request, purchase_data: PurchaseAssetRequest):
+def build_payment_xdr(request: Request, purchase_data: PurchaseAssetRequest):
     """Build a payment transaction XDR for Freighter to sign"""
-    print(f"[BUILD-XDR] Request received: asset_id={purchase_data.asset_id}, amount={purchase_data.amount_xlm}")
+    logger.debug("[BUILD-XDR] Request received: asset_id=%s, amount=%s", purchase_data.asset_id, purchase_data.amount_xlm)
     
     user = get_authenticated_user(request)
     user_wallet = user["wallet_address"]
-    print(f"[BUILD-XDR] User wallet: {user_wallet}")
+    logger.debug("[BUILD-XDR] User wallet: %s", user_wallet)
     
     if purchase_data.buyer_address != user_wallet:
-        print(f"[BUILD-XDR] ERROR: Buyer address mismatch")
+        logger.warning("[BUILD-XDR] Buyer address mismatch")
         raise HTTPException(status_code=403, detail="Buyer address must match authenticated user")
     
     if purchase_data.amount_xlm <= 0:
-        print(f"[BUILD-XDR] ERROR: Invalid amount")
+        logger.warning("[BUILD-XDR] Invalid amount")
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
-    connection = None
     try:
-        print(f"[BUILD-XDR] Connecting to database...")
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT a.asset_issuer_address, a.asset_code, a.contract_id
-            FROM assets a
-            WHERE a.id = %s
-        """, (purchase_data.asset_id,))
-        
-        asset = cursor.fetchone()
-        if not asset:
-            print(f"[BUILD-XDR] ERROR: Asset not found: {purchase_data.asset_id}")
+        target = get_payment_target(purchase_data.asset_id)
+        if not target:
+            logger.warning("[BUILD-XDR] Asset not found: %s", purchase_data.asset_id)
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        print(f"[BUILD-XDR] Asset found: {asset['asset_code']}, seller: {asset['asset_issuer_address']}")
+        destination, memo_text, memo = target
+        logger.debug("[BUILD-XDR] Asset found: %s, seller: %s", memo_text, destination)
         
         # Fetch account sequence from Horizon using Stellar SDK
-        from stellar_sdk import Server, TransactionBuilder, Network, Asset, Payment
-        from stellar_sdk.memo import TextMemo
-        
         try:
-            print(f"[BUILD-XDR] Fetching account from Horizon: {user_wallet}")
-            # Use testnet server
-            server = Server(horizon_url="https://horizon-testnet.stellar.org")
-            source_account = server.load_account(user_wallet)
-            print(f"[BUILD-XDR] Account loaded. Sequence: {source_account.sequence}")
+            logger.debug("[BUILD-XDR] Fetching account from Horizon: %s", user_wallet)
+            source_account = load_source_account(user_wallet)
+            logger.debug("[BUILD-XDR] Account loaded. Sequence: %s", source_account.sequence)
+        except NotFoundError:
+            logger.warning("[BUILD-XDR] Account not found on network: %s", user_wallet)
+            raise HTTPException(status_code=400, detail="Account not found on Stellar network. Fund it before purchasing.")
         except Exception as e:
-            print(f"[BUILD-XDR] ERROR: Failed to fetch account: {str(e)}")
+            logger.error("[BUILD-XDR] Failed to fetch account: %s", str(e))
             raise HTTPException(status_code=500, detail=f"Failed to fetch account from Stellar network: {str(e)}")
         
-        # Convert XLM to stroops
-        amount_stroops = int(purchase_data.amount_xlm * 10000000)
-        print(f"[BUILD-XDR] Amount: {purchase_data.amount_xlm} XLM = {amount_stroops} stroops")
+        # Convert XLM to stroops (via the decimal string, so e.g. 0.1 XLM is exact)
+        amount_stroops = purchase_data.amount_stroops
+        logger.debug("[BUILD-XDR] Amount: %s XLM = %s stroops", purchase_data.amount_xlm, amount_stroops)
         
         # Build transaction
         network_passphrase = Network.TESTNET_NETWORK_PASSPHRASE
         base_fee = 100  # Standard fee in stroops
         
-        print(f"[BUILD-XDR] Building transaction...")
+        logger.debug("[BUILD-XDR] Building transaction...")
         transaction = (
             TransactionBuilder(
                 source_account=source_account,
@@ -1559,119 +2184,84 @@ async def build_payment_xdr(request: Request, purchase_data: PurchaseAssetReques
             )
             .add_operation(
                 Payment(
-                    destination=asset["asset_issuer_address"],
+                    destination=destination,
                     asset=Asset.native(),
                     amount=str(amount_stroops),
                 )
             )
-            .add_memo(TextMemo(f"Purchase {asset['asset_code']}"[:28]))  # Max 28 bytes
+            .add_memo(memo)
             .set_timeout(300)  # 5 minutes
             .build()
         )
         
         # Convert to XDR
         transaction_xdr = transaction.to_xdr()
-        print(f"[BUILD-XDR] Transaction XDR built successfully. Length: {len(transaction_xdr)}")
+        logger.debug("[BUILD-XDR] Transaction XDR built successfully. Length: %s", len(transaction_xdr))
         
         return {
             "success": True,
             "transaction_xdr": transaction_xdr,
             "network": "testnet",
             "amount_xlm": purchase_data.amount_xlm,
-            "destination": asset["asset_issuer_address"],
-            "memo": f"Purchase {asset['asset_code']}",
+            "destination": destination,
+            "memo": memo_text,
         }
         
     except HTTPException:
         raise
-    except Exception as e:
-        print(f"[BUILD-XDR] ERROR: Exception occurred: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to build transaction: {str(e)}")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
-            print(f"[BUILD-XDR] Database connection closed")
+    except Exception as e:
+        logger.error("[BUILD-XDR] Exception occurred: %s: %s", type(e).__name__, str(e))
+        logger.debug("Traceback:", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to build transaction: {str(e)}")
 
 
 @app.post("/assets/purchase")
-async def purchase_asset(request: Request, purchase_data: PurchaseAssetRequest):
+def purchase_asset(request: Request, purchase_data: PurchaseAssetRequest):
     """Purchase assets with XLM payment"""
-    print(f"[PURCHASE] Request received: asset_id={purchase_data.asset_id}, amount={purchase_data.amount_xlm}")
+    logger.debug("[PURCHASE] Request received: asset_id=%s, amount=%s", purchase_data.asset_id, purchase_data.amount_xlm)
     
     user = get_authenticated_user(request)
     user_id = user["user_id"]
     user_wallet = user["wallet_address"]
-    print(f"[PURCHASE] User: {user_id}, wallet: {user_wallet}")
+    logger.debug("[PURCHASE] User: %s, wallet: %s", user_id, user_wallet)
     
     # Verify that buyer_address matches authenticated user
     if purchase_data.buyer_address != user_wallet:
-        print(f"[PURCHASE] ERROR: Buyer address mismatch")
+        logger.warning("[PURCHASE] Buyer address mismatch")
         raise HTTPException(status_code=403, detail="Buyer address must match authenticated user")
     
     # Validate amount
     if purchase_data.amount_xlm <= 0:
-        print(f"[PURCHASE] ERROR: Invalid amount")
+        logger.warning("[PURCHASE] Invalid amount")
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
-    connection = None
     try:
-        print(f"[PURCHASE] Connecting to database...")
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
         # Get asset details
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.project_id,
-                a.asset_code,
-                a.contract_id,
-                a.asset_issuer_address,
-                a.price_per_ton,
-                a.total_supply,
-                a.is_frozen,
-                p.issuer_id,
-                p.project_identifier,
-                p.name as project_name
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE a.id = %s
-        """, (purchase_data.asset_id,))
-        
-        asset = cursor.fetchone()
+        asset = get_asset_with_project(purchase_data.asset_id)
         
         if not asset:
-            print(f"[PURCHASE] ERROR: Asset not found: {purchase_data.asset_id}")
+            logger.warning("[PURCHASE] Asset not found: %s", purchase_data.asset_id)
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        print(f"[PURCHASE] Asset found: {asset['asset_code']}, issuer_id: {asset['issuer_id']}")
+        logger.debug("[PURCHASE] Asset found: %s, issuer_id: %s", asset['asset_code'], asset['issuer_id'])
         
         if asset["is_frozen"]:
-            print(f"[PURCHASE] ERROR: Asset is frozen")
+            logger.warning("[PURCHASE] Asset is frozen")
             raise HTTPException(status_code=400, detail="Asset is frozen and cannot be purchased")
         
         # Check if user is trying to buy their own asset
         if asset["issuer_id"] == user_id:
-            print(f"[PURCHASE] ERROR: User trying to buy own asset")
+            logger.warning("[PURCHASE] User trying to buy own asset")
             raise HTTPException(status_code=400, detail="You cannot purchase assets from your own project")
         
         # Calculate how many tokens can be purchased
-        # If price_per_ton is set, use it; otherwise, allow any amount
-        # Convert decimal.Decimal to float for calculation
-        price_per_ton = float(asset["price_per_ton"]) if asset["price_per_ton"] else None
-        if price_per_ton and price_per_ton > 0:
-            tokens_purchased = purchase_data.amount_xlm / price_per_ton
-            print(f"[PURCHASE] Price per ton: {price_per_ton}, tokens: {tokens_purchased}")
-        else:
-            # If no price set, we'll use a 1:1 ratio (1 XLM = 1 token)
-            # In production, you might want to set a default price
-            tokens_purchased = purchase_data.amount_xlm
-            print(f"[PURCHASE] No price set, using 1:1 ratio, tokens: {tokens_purchased}")
+        # If price_per_ton is set, use it; otherwise use a 1:1 ratio (1 XLM = 1 token)
+        amount_xlm_stroops = purchase_data.amount_stroops
+        tokens_stroops = compute_tokens_stroops(amount_xlm_stroops, asset["price_per_ton"])
+        tokens_purchased = Decimal(tokens_stroops) / STROOPS_PER_XLM
+        logger.debug("[PURCHASE] Price per ton: %s, tokens: %s", asset["price_per_ton"], tokens_purchased)
         
-        print(f"[PURCHASE] Purchase validated successfully")
+        logger.debug("[PURCHASE] Purchase validated successfully")
         
         # Store purchase intent in database for tracking
         # In a production system, you might want to create a purchases table
@@ -1688,9 +2278,9 @@ async def purchase_asset(request: Request, purchase_data: PurchaseAssetRequest):
             },
             "purchase": {
                 "amount_xlm": purchase_data.amount_xlm,
-                "amount_stroops": int(purchase_data.amount_xlm * 10000000),  # Convert to stroops
+                "amount_stroops": amount_xlm_stroops,
                 "tokens_purchased": tokens_purchased,
-                "tokens_purchased_stroops": int(tokens_purchased * 10000000),  # 7 decimals
+                "tokens_purchased_stroops": tokens_stroops,  # 7 decimals
                 "buyer_address": purchase_data.buyer_address,
                 "seller_address": asset["asset_issuer_address"],
             },
@@ -1704,12 +2294,8 @@ async def purchase_asset(request: Request, purchase_data: PurchaseAssetRequest):
     except HTTPException:
         raise
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 
 @app.post("/assets/atomic-swap")
@@ -1718,114 +2304,78 @@ async def atomic_swap(request: Request, swap_data: AtomicSwapRequest):
     Perform atomic swap: Admin transfers XLM from buyer to seller and tokens from seller to buyer.
     This requires proper authorization from both parties.
     """
-    print(f"[ATOMIC-SWAP] ===== SWAP REQUEST RECEIVED ======")
-    print(f"[ATOMIC-SWAP] Asset ID: {swap_data.asset_id}")
-    print(f"[ATOMIC-SWAP] Amount XLM: {swap_data.amount_xlm}")
-    print(f"[ATOMIC-SWAP] Buyer Address: {swap_data.buyer_address}")
+    logger.debug("[ATOMIC-SWAP] Request received: asset_id=%s, amount=%s, buyer=%s",
+                 swap_data.asset_id, swap_data.amount_xlm, swap_data.buyer_address)
     
     # Verify user is authenticated
     user = get_authenticated_user(request)
     user_wallet = user["wallet_address"]
-    print(f"[ATOMIC-SWAP] Authenticated user: {user['user_id']}, wallet: {user_wallet}")
+    logger.debug("[ATOMIC-SWAP] Authenticated user: %s, wallet: %s", user['user_id'], user_wallet)
     
     if swap_data.buyer_address != user_wallet:
-        print(f"[ATOMIC-SWAP] ERROR: Buyer address mismatch")
+        logger.warning("[ATOMIC-SWAP] Buyer address mismatch")
         raise HTTPException(status_code=403, detail="Buyer address must match authenticated user")
     
     if swap_data.amount_xlm <= 0:
-        print(f"[ATOMIC-SWAP] ERROR: Invalid amount")
+        logger.warning("[ATOMIC-SWAP] Invalid amount")
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
-    connection = None
     try:
-        print(f"[ATOMIC-SWAP] Step 1: Fetching asset and project data...")
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get asset and project details
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.project_id,
-                a.asset_code,
-                a.contract_id,
-                a.asset_issuer_address,
-                a.price_per_ton,
-                a.total_supply,
-                a.is_frozen,
-                p.issuer_id,
-                p.project_identifier,
-                p.name as project_name
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE a.id = %s
-        """, (swap_data.asset_id,))
-        
-        asset = cursor.fetchone()
+        logger.debug("[ATOMIC-SWAP] Step 1: Fetching asset and project data...")
+        # Both block (DB and Horizon), so they run in the threadpool, side by side since
+        # neither depends on the other; a failed account load is reported at step 4
+        loop = asyncio.get_running_loop()
+        asset, buyer_account = await asyncio.gather(
+            loop.run_in_executor(None, get_asset_with_project, swap_data.asset_id),
+            loop.run_in_executor(None, load_source_account, swap_data.buyer_address),
+            return_exceptions=True,
+        )
+        if isinstance(asset, BaseException):
+            raise asset
         
         if not asset:
-            print(f"[ATOMIC-SWAP] ERROR: Asset not found")
+            logger.warning("[ATOMIC-SWAP] Asset not found")
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        print(f"[ATOMIC-SWAP] Asset found: {asset['asset_code']}, contract: {asset['contract_id']}")
-        print(f"[ATOMIC-SWAP] Seller address: {asset['asset_issuer_address']}")
-        print(f"[ATOMIC-SWAP] Buyer address: {swap_data.buyer_address}")
+        logger.debug("[ATOMIC-SWAP] Asset found: %s, contract: %s, seller: %s",
+                     asset['asset_code'], asset['contract_id'], asset['asset_issuer_address'])
         
         if asset["is_frozen"]:
-            print(f"[ATOMIC-SWAP] ERROR: Asset is frozen")
+            logger.warning("[ATOMIC-SWAP] Asset is frozen")
             raise HTTPException(status_code=400, detail="Asset is frozen and cannot be purchased")
         
         if asset["issuer_id"] == user["user_id"]:
-            print(f"[ATOMIC-SWAP] ERROR: User trying to buy own asset")
+            logger.warning("[ATOMIC-SWAP] User trying to buy own asset")
             raise HTTPException(status_code=400, detail="You cannot purchase assets from your own project")
         
         # Calculate tokens to purchase
-        # Convert decimal.Decimal to float for calculation
-        price_per_ton = float(asset["price_per_ton"]) if asset["price_per_ton"] else None
-        if price_per_ton and price_per_ton > 0:
-            tokens_purchased = swap_data.amount_xlm / price_per_ton
-            print(f"[ATOMIC-SWAP] Price per ton: {price_per_ton}, tokens: {tokens_purchased}")
-        else:
-            tokens_purchased = swap_data.amount_xlm
-            print(f"[ATOMIC-SWAP] No price set, using 1:1 ratio, tokens: {tokens_purchased}")
-        
-        print(f"[ATOMIC-SWAP] Step 2: Calculated tokens: {tokens_purchased} tons")
-        print(f"[ATOMIC-SWAP] Price per ton: {asset['price_per_ton']}")
-        
-        # Convert amounts
-        amount_xlm_stroops = int(swap_data.amount_xlm * 10000000)
-        tokens_stroops = int(tokens_purchased * 10000000)  # 7 decimals
-        
-        print(f"[ATOMIC-SWAP] Amount in stroops: {amount_xlm_stroops}")
-        print(f"[ATOMIC-SWAP] Tokens in stroops: {tokens_stroops}")
+        amount_xlm_stroops = swap_data.amount_stroops
+        tokens_stroops = compute_tokens_stroops(amount_xlm_stroops, asset["price_per_ton"])
+        tokens_purchased = Decimal(tokens_stroops) / STROOPS_PER_XLM
         
-        # Import Stellar SDK and Soroban service
-        from stellar_sdk import Server, Keypair, Network, TransactionBuilder, Payment, Asset
-        from stellar_sdk.memo import TextMemo
-        from soroban_service import SorobanService
+        logger.debug("[ATOMIC-SWAP] Step 2: %s tons at %s per ton (%s XLM stroops, %s token stroops)",
+                     tokens_purchased, asset['price_per_ton'], amount_xlm_stroops, tokens_stroops)
         
-        print(f"[ATOMIC-SWAP] Step 3: Initializing services...")
-        soroban_service = SorobanService()
-        
-        # Get admin keypair
-        admin_keypair = Keypair.from_secret(soroban_service.admin_secret)
-        admin_address = admin_keypair.public_key
-        print(f"[ATOMIC-SWAP] Admin address: {admin_address}")
+        logger.debug("[ATOMIC-SWAP] Step 3: Initializing services...")
+        admin_address = get_admin_keypair().public_key
+        logger.debug("[ATOMIC-SWAP] Admin address: %s", admin_address)
         
         # Step 4: Get XLM from buyer (requires buyer to sign)
-        print(f"[ATOMIC-SWAP] Step 4: Building XLM transfer from buyer to admin...")
-        server = Server(horizon_url="https://horizon-testnet.stellar.org")
-        
+        logger.debug("[ATOMIC-SWAP] Step 4: Building XLM transfer from buyer to admin...")
         try:
-            buyer_account = server.load_account(swap_data.buyer_address)
-            print(f"[ATOMIC-SWAP] Buyer account loaded. Sequence: {buyer_account.sequence}")
+            if isinstance(buyer_account, BaseException):
+                raise buyer_account
+            logger.debug("[ATOMIC-SWAP] Buyer account loaded. Sequence: %s", buyer_account.sequence)
+        except NotFoundError:
+            logger.warning("[ATOMIC-SWAP] Buyer account not found on network: %s", swap_data.buyer_address)
+            raise HTTPException(status_code=400, detail="Buyer account not found on Stellar network. Fund it before purchasing.")
         except Exception as e:
-            print(f"[ATOMIC-SWAP] ERROR: Failed to load buyer account: {e}")
+            logger.error("[ATOMIC-SWAP] Failed to load buyer account: %s", e)
             raise HTTPException(status_code=400, detail=f"Buyer account not found on network: {str(e)}")
         
         # Build transaction to transfer XLM from buyer to admin (escrow)
         # Note: This requires buyer signature, so we'll return XDR for frontend to sign
-        print(f"[ATOMIC-SWAP] Step 5: Building buyer payment transaction...")
+        logger.debug("[ATOMIC-SWAP] Step 5: Building buyer payment transaction...")
         buyer_payment_tx = (
             TransactionBuilder(
                 source_account=buyer_account,
@@ -1839,24 +2389,21 @@ async def atomic_swap(request: Request, swap_data: AtomicSwapRequest):
                     amount=str(amount_xlm_stroops),
                 )
             )
-            .add_memo(TextMemo(f"Buy {asset['asset_code']}"[:28]))  # Max 28 bytes
+            .add_memo(swap_memo("Buy", asset['asset_code']))
             .set_timeout(300)
             .build()
         )
         
         buyer_payment_xdr = buyer_payment_tx.to_xdr()
-        print(f"[ATOMIC-SWAP] Buyer payment XDR built. Length: {len(buyer_payment_xdr)}")
+        logger.debug("[ATOMIC-SWAP] Buyer payment XDR built. Length: %s", len(buyer_payment_xdr))
         
         # Step 5: Prepare for token transfer
-        print(f"[ATOMIC-SWAP] Step 6: Preparing token transfer details...")
-        print(f"[ATOMIC-SWAP] Token contract: {asset['contract_id']}")
-        print(f"[ATOMIC-SWAP] Seller: {asset['asset_issuer_address']}")
-        print(f"[ATOMIC-SWAP] Buyer: {swap_data.buyer_address}")
-        print(f"[ATOMIC-SWAP] Tokens to transfer: {tokens_stroops} (smallest units)")
+        logger.debug("[ATOMIC-SWAP] Step 6: Token transfer of %s stroops on %s from %s to %s",
+                     tokens_stroops, asset['contract_id'], asset['asset_issuer_address'], swap_data.buyer_address)
         
         # Return XDR for buyer to sign
         # After buyer signs and XLM is received, we'll need a separate endpoint to complete the swap
-        print(f"[ATOMIC-SWAP] Step 7: Preparing response...")
+        logger.debug("[ATOMIC-SWAP] Step 7: Preparing response...")
         return {
             "success": True,
             "message": "Atomic swap prepared. Sign the XLM payment transaction.",
@@ -1883,15 +2430,28 @@ async def atomic_swap(request: Request, swap_data: AtomicSwapRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ATOMIC-SWAP] ERROR: Exception occurred: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("[ATOMIC-SWAP] Failed for asset %s: %s: %s", swap_data.asset_id, type(e).__name__, e,
+                     exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=500, detail=f"Atomic swap failed: {str(e)}")
+
+
+def record_purchase(asset_id: int, buyer_id: int, seller_id: int, amount_xlm, tokens_purchased, seller_payment_hash: Optional[str]) -> int:
+    """Insert a completed swap into purchases and return its id"""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO purchases (
+                asset_id, buyer_id, seller_id, amount_xlm, tokens_purchased,
+                seller_payment_hash
+            ) VALUES (%s, %s, %s, %s, %s, %s)
+        """, (asset_id, buyer_id, seller_id, amount_xlm, tokens_purchased, seller_payment_hash))
+        connection.commit()
+        purchase_id = cursor.lastrowid
+        cursor.close()
+        return purchase_id
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
-            print(f"[ATOMIC-SWAP] Database connection closed")
+        connection.close()
 
 
 @app.post("/assets/complete-swap")
@@ -1900,68 +2460,49 @@ async def complete_swap(request: Request, swap_data: AtomicSwapRequest):
     Complete the atomic swap after XLM payment is confirmed.
     Admin transfers tokens from seller to buyer and XLM from admin to seller.
     """
-    print(f"[COMPLETE-SWAP] ===== COMPLETE SWAP REQUEST RECEIVED ======")
-    print(f"[COMPLETE-SWAP] Asset ID: {swap_data.asset_id}")
-    print(f"[COMPLETE-SWAP] Amount XLM: {swap_data.amount_xlm}")
-    print(f"[COMPLETE-SWAP] Buyer Address: {swap_data.buyer_address}")
-    print(f"[COMPLETE-SWAP] Request body: {swap_data}")
+    logger.debug("[COMPLETE-SWAP] Request received: asset_id=%s, amount=%s, buyer=%s",
+                 swap_data.asset_id, swap_data.amount_xlm, swap_data.buyer_address)
     
     user = get_authenticated_user(request)
     if swap_data.buyer_address != user["wallet_address"]:
-        print(f"[COMPLETE-SWAP] ERROR: Buyer address mismatch")
+        logger.warning("[COMPLETE-SWAP] Buyer address mismatch")
         raise HTTPException(status_code=403, detail="Buyer address must match authenticated user")
     
-    connection = None
+    # The buyer has just submitted the payment built by atomic-swap, so that sequence is used up
+    forget_account_sequence(swap_data.buyer_address)
+    
     try:
-        print(f"[COMPLETE-SWAP] Step 1: Fetching asset data...")
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT a.asset_code, a.contract_id, a.asset_issuer_address, a.price_per_ton, p.project_identifier, a.vintage_year
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE a.id = %s
-        """, (swap_data.asset_id,))
+        logger.debug("[COMPLETE-SWAP] Step 1: Fetching asset data...")
+        # Shared cached lookup; no connection is held while the Soroban mint and Horizon payment run.
+        # It can block on the DB (or on a concurrent load of the same asset), so it runs in the threadpool
+        loop = asyncio.get_running_loop()
+        asset = await loop.run_in_executor(None, get_asset_with_project, swap_data.asset_id)
         
-        asset = cursor.fetchone()
         if not asset:
-            print(f"[COMPLETE-SWAP] ERROR: Asset not found")
+            logger.warning("[COMPLETE-SWAP] Asset not found")
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        print(f"[COMPLETE-SWAP] Asset: {asset['asset_code']}, Contract: {asset['contract_id']}")
+        logger.debug("[COMPLETE-SWAP] Asset: %s, Contract: %s", asset['asset_code'], asset['contract_id'])
         
         # Calculate tokens
-        # Convert decimal.Decimal to float for calculation
-        price_per_ton = float(asset["price_per_ton"]) if asset["price_per_ton"] else None
-        if price_per_ton and price_per_ton > 0:
-            tokens_purchased = swap_data.amount_xlm / price_per_ton
-            print(f"[COMPLETE-SWAP] Price per ton: {price_per_ton}, tokens: {tokens_purchased}")
-        else:
-            tokens_purchased = swap_data.amount_xlm
-            print(f"[COMPLETE-SWAP] No price set, using 1:1 ratio, tokens: {tokens_purchased}")
-        
-        tokens_stroops = int(tokens_purchased * 10000000)
-        amount_xlm_stroops = int(swap_data.amount_xlm * 10000000)
+        amount_xlm_stroops = swap_data.amount_stroops
+        tokens_stroops = compute_tokens_stroops(amount_xlm_stroops, asset["price_per_ton"])
+        tokens_purchased = Decimal(tokens_stroops) / STROOPS_PER_XLM
+        logger.debug("[COMPLETE-SWAP] Price per ton: %s, tokens: %s", asset["price_per_ton"], tokens_purchased)
         
-        print(f"[COMPLETE-SWAP] Step 2: Tokens to transfer: {tokens_stroops}")
-        print(f"[COMPLETE-SWAP] XLM to transfer to seller: {amount_xlm_stroops}")
+        logger.debug("[COMPLETE-SWAP] Step 2: %s token stroops to buyer, %s XLM stroops to seller", tokens_stroops, amount_xlm_stroops)
         
-        # Import services
-        from stellar_sdk import Server, Keypair, Network, TransactionBuilder, Payment, Asset
-        from stellar_sdk.memo import TextMemo
-        from soroban_service import SorobanService
-        
-        soroban_service = SorobanService()
-        admin_keypair = Keypair.from_secret(soroban_service.admin_secret)
+        soroban_service = get_soroban_service()
+        admin_keypair = get_admin_keypair()
         admin_address = admin_keypair.public_key
         
-        print(f"[COMPLETE-SWAP] Step 3: Admin address: {admin_address}")
+        logger.debug("[COMPLETE-SWAP] Step 3: Admin address: %s", admin_address)
+        
+        # Mint and payout are both admin transactions; they go through the single Soroban worker,
+        # off the event loop, so neither one reads an admin sequence number the other is about to use
         
         # Step 3: Mint tokens directly to buyer
-        print(f"[COMPLETE-SWAP] Step 4: Minting tokens directly to buyer...")
-        print(f"[COMPLETE-SWAP] Buyer: {swap_data.buyer_address}")
-        print(f"[COMPLETE-SWAP] Amount: {tokens_purchased} tons ({tokens_stroops} stroops)")
+        logger.debug("[COMPLETE-SWAP] Step 4: Minting %s tons directly to buyer %s", tokens_purchased, swap_data.buyer_address)
         
         try:
             # Get asset_code for carbon controller mint call
@@ -1975,121 +2516,86 @@ async def complete_swap(request: Request, swap_data: AtomicSwapRequest):
                 else:
                     raise Exception("Cannot determine asset_code for minting")
             
-            print(f"[COMPLETE-SWAP] Asset code: {asset_code}")
-            print(f"[COMPLETE-SWAP] Minting {tokens_purchased} tokens to buyer {swap_data.buyer_address}")
+            logger.debug("[COMPLETE-SWAP] Asset code: %s", asset_code)
             
             # Mint tokens directly to buyer using carbon controller
-            soroban_service.mint_to_issuer(
-                asset_code=asset_code,
-                issuer_address=swap_data.buyer_address,  # Mint to buyer instead of issuer
-                amount=float(tokens_purchased)
+            await loop.run_in_executor(
+                soroban_executor,
+                functools.partial(
+                    soroban_service.mint_to_issuer,
+                    asset_code=asset_code,
+                    issuer_address=swap_data.buyer_address,  # Mint to buyer instead of issuer
+                    amount=tokens_purchased,
+                    token_contract_id=asset['contract_id'],  # So the buyer's next balance read is fresh
+                ),
             )
-            print(f"[COMPLETE-SWAP] ✓ Tokens minted successfully to buyer")
+            logger.debug("[COMPLETE-SWAP] ✓ Tokens minted successfully to buyer")
         except Exception as e:
             error_msg = str(e)
-            print(f"[COMPLETE-SWAP] ERROR: Token minting failed: {error_msg}")
-            print(f"[COMPLETE-SWAP] DETAILED ERROR: {type(e).__name__}: {error_msg}")
+            logger.error("[COMPLETE-SWAP] Token minting failed: %s: %s", type(e).__name__, error_msg)
             raise HTTPException(status_code=500, detail=f"Token minting failed: {error_msg}")
         
         # Step 4: Transfer XLM from admin to seller
-        print(f"[COMPLETE-SWAP] Step 5: Transferring XLM from admin to seller...")
-        print(f"[COMPLETE-SWAP] From: {admin_address}, To: {asset['asset_issuer_address']}")
+        logger.debug("[COMPLETE-SWAP] Step 5: Transferring XLM from admin %s to seller %s", admin_address, asset['asset_issuer_address'])
         
-        server = Server(horizon_url="https://horizon-testnet.stellar.org")
-        admin_account = server.load_account(admin_address)
-        
-        seller_payment_tx = (
-            TransactionBuilder(
-                source_account=admin_account,
-                network_passphrase=Network.TESTNET_NETWORK_PASSPHRASE,
-                base_fee=100,
-            )
-            .append_operation(
-                Payment(
-                    destination=asset["asset_issuer_address"],
-                    asset=Asset.native(),
-                    amount=str(amount_xlm_stroops),
+        def pay_seller():
+            # Load the admin account only once the mint has landed so the sequence number is current
+            admin_account = horizon_server.load_account(admin_address)
+            
+            seller_payment_tx = (
+                TransactionBuilder(
+                    source_account=admin_account,
+                    network_passphrase=Network.TESTNET_NETWORK_PASSPHRASE,
+                    base_fee=100,
                 )
+                .append_operation(
+                    Payment(
+                        destination=asset["asset_issuer_address"],
+                        asset=Asset.native(),
+                        amount=str(amount_xlm_stroops),
+                    )
+                )
+                .add_memo(swap_memo("Pay", asset['asset_code']))
+                .set_timeout(300)
+                .build()
             )
-            .add_memo(TextMemo(f"Pay {asset['asset_code']}"[:28]))  # Max 28 bytes
-            .set_timeout(300)
-            .build()
-        )
-        
-        seller_payment_tx.sign(admin_keypair)
-        print(f"[COMPLETE-SWAP] XLM payment transaction built and signed")
+            
+            seller_payment_tx.sign(admin_keypair)
+            logger.debug("[COMPLETE-SWAP] XLM payment transaction built and signed")
+            return horizon_server.submit_transaction(seller_payment_tx)
         
         try:
-            response = server.submit_transaction(seller_payment_tx)
-            print(f"[COMPLETE-SWAP] ✓ XLM transferred successfully. Hash: {response['hash']}")
+            response = await loop.run_in_executor(soroban_executor, pay_seller)
+            logger.debug("[COMPLETE-SWAP] ✓ XLM transferred successfully. Hash: %s", response['hash'])
         except Exception as e:
-            print(f"[COMPLETE-SWAP] ERROR: XLM transfer failed: {e}")
+            logger.error("[COMPLETE-SWAP] XLM transfer failed: %s", e)
+            # The buyer already holds the minted tokens, so keep the purchase on record with no
+            # seller payment hash; those rows are the ones still owed a payout
+            try:
+                purchase_id = await loop.run_in_executor(
+                    None, record_purchase, swap_data.asset_id, user["user_id"], asset["issuer_id"],
+                    swap_data.amount_xlm, tokens_purchased, None
+                )
+                logger.error("[COMPLETE-SWAP] Purchase %s recorded without seller payment; seller %s is owed %s XLM",
+                             purchase_id, asset["asset_issuer_address"], swap_data.amount_xlm)
+            except Exception as db_error:
+                logger.error("[COMPLETE-SWAP] Failed to record unpaid purchase: %s", db_error)
             raise HTTPException(status_code=500, detail=f"XLM transfer failed: {str(e)}")
         
-        print(f"[COMPLETE-SWAP] ===== SWAP COMPLETED SUCCESSFULLY ======")
+        logger.debug("[COMPLETE-SWAP] ===== SWAP COMPLETED SUCCESSFULLY ======")
         
         # Step 5: Record purchase in database
-        print(f"[COMPLETE-SWAP] Step 6: Recording purchase in database...")
+        logger.debug("[COMPLETE-SWAP] Step 6: Recording purchase in database...")
         try:
-            # Get asset details for purchase record
-            cursor.execute("""
-                SELECT a.id, a.project_id, p.issuer_id as seller_id
-                FROM assets a
-                LEFT JOIN projects p ON a.project_id = p.id
-                WHERE a.id = %s
-            """, (swap_data.asset_id,))
-            asset_details = cursor.fetchone()
-            
-            # Create purchases table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS purchases (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    asset_id INT NOT NULL,
-                    buyer_id INT NOT NULL,
-                    seller_id INT NOT NULL,
-                    amount_xlm DECIMAL(20, 7) NOT NULL,
-                    tokens_purchased DECIMAL(20, 7) NOT NULL,
-                    xlm_payment_hash VARCHAR(255),
-                    token_transfer_hash VARCHAR(255),
-                    seller_payment_hash VARCHAR(255),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (asset_id) REFERENCES assets(id),
-                    FOREIGN KEY (buyer_id) REFERENCES users(user_id),
-                    FOREIGN KEY (seller_id) REFERENCES users(user_id),
-                    INDEX idx_buyer (buyer_id),
-                    INDEX idx_seller (seller_id),
-                    INDEX idx_asset (asset_id)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
-            """)
-            
-            # Get buyer user_id
-            cursor.execute("SELECT user_id FROM users WHERE wallet_address = %s", (swap_data.buyer_address,))
-            buyer_record = cursor.fetchone()
-            buyer_id = buyer_record["user_id"] if buyer_record else None
-            
-            if not buyer_id:
-                print(f"[COMPLETE-SWAP] WARNING: Could not find buyer user_id for address {swap_data.buyer_address}")
-            else:
-                # Insert purchase record
-                cursor.execute("""
-                    INSERT INTO purchases (
-                        asset_id, buyer_id, seller_id, amount_xlm, tokens_purchased,
-                        seller_payment_hash
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    swap_data.asset_id,
-                    buyer_id,
-                    asset_details["seller_id"],
-                    swap_data.amount_xlm,
-                    tokens_purchased,
-                    response.get('hash')
-                ))
-                connection.commit()
-                print(f"[COMPLETE-SWAP] ✓ Purchase recorded in database. Purchase ID: {cursor.lastrowid}")
+            # Buyer is the authenticated user (address checked above); seller came with the asset row
+            purchase_id = await loop.run_in_executor(
+                None, record_purchase, swap_data.asset_id, user["user_id"], asset["issuer_id"],
+                swap_data.amount_xlm, tokens_purchased, response.get('hash')
+            )
+            logger.debug("[COMPLETE-SWAP] ✓ Purchase recorded in database. Purchase ID: %s", purchase_id)
         except Exception as e:
-            print(f"[COMPLETE-SWAP] WARNING: Failed to record purchase in database: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("[COMPLETE-SWAP] Failed to record purchase in database: %s", e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
             # Don't fail the whole transaction if DB recording fails
         
         return {
@@ -2103,18 +2609,32 @@ async def complete_swap(request: Request, swap_data: AtomicSwapRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[COMPLETE-SWAP] ERROR: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("[COMPLETE-SWAP] Failed for asset %s: %s: %s", swap_data.asset_id, type(e).__name__, e,
+                     exc_info=logger.isEnabledFor(logging.DEBUG))
         raise HTTPException(status_code=500, detail=f"Swap completion failed: {str(e)}")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+
+
+# Assets of every project owned by an issuer, newest first
+SQL_ISSUER_ASSETS = """
+    SELECT 
+        a.id,
+        a.asset_code,
+        a.contract_id,
+        a.asset_issuer_address,
+        a.total_supply,
+        a.is_frozen,
+        p.project_identifier,
+        p.name as project_name,
+        a.vintage_year
+    FROM assets a
+    LEFT JOIN projects p ON a.project_id = p.id
+    WHERE p.issuer_id = %s
+    ORDER BY a.created_at DESC
+"""
 
 
 @app.get("/issuer/assets")
-async def get_issuer_assets(request: Request):
+def get_issuer_assets(request: Request):
     """
     Get all assets for the current authenticated issuer.
     """
@@ -2124,52 +2644,68 @@ async def get_issuer_assets(request: Request):
     connection = None
     try:
         connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
+        cursor = connection.cursor()
         
         # Verify user is an ISSUER
-        cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data.get("role") != "ISSUER":
+        if get_user_role(user, connection) != "ISSUER":
             raise HTTPException(status_code=403, detail="Only issuers can access this endpoint")
         
         # Get all assets for projects owned by this issuer
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.asset_code,
-                a.contract_id,
-                a.asset_issuer_address,
-                a.total_supply,
-                a.is_frozen,
-                p.project_identifier,
-                p.name as project_name,
-                a.vintage_year
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE p.issuer_id = %s
-            ORDER BY a.created_at DESC
-        """, (user_id,))
+        cursor.execute(SQL_ISSUER_ASSETS, (user_id,))
         
-        assets = cursor.fetchall()
+        assets = fetch_all_dicts(cursor)
         
-        return assets
+        return json_response(assets)
         
     except HTTPException:
         raise
     except Error as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         raise HTTPException(status_code=500, detail="Database error")
     finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
 
 
 class ApproveAdminRequest(BaseModel):
     secret_key: Optional[str] = None  # Seller's secret key (optional, for server-side approval)
 
 
+# Deployed assets an issuer still holds, with the supply the admin allowance is based on
+SQL_ISSUER_ASSETS_TO_APPROVE = """
+    SELECT 
+        a.id,
+        a.asset_code,
+        a.contract_id,
+        a.asset_issuer_address,
+        a.total_supply_stroops
+    FROM assets a
+    LEFT JOIN projects p ON a.project_id = p.id
+    WHERE p.issuer_id = %s AND a.contract_id IS NOT NULL
+        AND a.asset_issuer_address = %s
+"""
+
+
+def get_issuer_assets_to_approve(user: dict) -> list:
+    """Deployed assets the issuer still holds; raises 403 for anyone who isn't an issuer"""
+    connection = get_db_connection()
+    try:
+        # Verify user is an ISSUER
+        if get_user_role(user, connection) != "ISSUER":
+            raise HTTPException(status_code=403, detail="Only issuers can approve admin")
+        
+        cursor = connection.cursor()
+        cursor.execute(SQL_ISSUER_ASSETS_TO_APPROVE, (user["user_id"], user["wallet_address"]))
+        assets = fetch_all_dicts(cursor)
+        cursor.close()
+        return assets
+    finally:
+        connection.close()
+
+
 @app.post("/issuer/approve-admin-all")
 async def approve_admin_for_all_assets(request: Request, approve_data: ApproveAdminRequest = None):
     """
@@ -2180,36 +2716,12 @@ async def approve_admin_for_all_assets(request: Request, approve_data: ApproveAd
     WARNING: Providing secret key in request is insecure - only use in development!
     """
     user = get_authenticated_user(request)
-    user_id = user["user_id"]
     user_wallet = user["wallet_address"]
     
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Verify user is an ISSUER
-        cursor.execute("SELECT role FROM users WHERE user_id = %s", (user_id,))
-        user_data = cursor.fetchone()
-        
-        if not user_data or user_data.get("role") != "ISSUER":
-            raise HTTPException(status_code=403, detail="Only issuers can approve admin")
-        
-        # Get all assets for projects owned by this issuer
-        cursor.execute("""
-            SELECT 
-                a.id,
-                a.asset_code,
-                a.contract_id,
-                a.asset_issuer_address,
-                a.total_supply
-            FROM assets a
-            LEFT JOIN projects p ON a.project_id = p.id
-            WHERE p.issuer_id = %s AND a.contract_id IS NOT NULL
-                AND a.asset_issuer_address = %s
-        """, (user_id, user_wallet))
-        
-        assets = cursor.fetchall()
+        # Get all assets for projects owned by this issuer (a DB round trip, so off the event loop)
+        loop = asyncio.get_running_loop()
+        assets = await loop.run_in_executor(None, get_issuer_assets_to_approve, user)
         
         if not assets:
             return {
@@ -2218,43 +2730,46 @@ async def approve_admin_for_all_assets(request: Request, approve_data: ApproveAd
                 "approved_count": 0
             }
         
-        # Import soroban service
-        from soroban_service import SorobanService
-        soroban_service = SorobanService()
-        admin_address = soroban_service.get_admin_address()
+        soroban_service = get_soroban_service()
+        admin_address = get_admin_keypair().public_key
         
         # If secret key provided, try to approve server-side
         if approve_data and approve_data.secret_key:
             approved_count = 0
             failed_assets = []
             
-            for asset in assets:
-                try:
-                    # Calculate approval amount (100x total supply for safety)
-                    total_supply_stroops = int(float(asset['total_supply']) * 10000000)
-                    approval_amount = total_supply_stroops * 100
-                    
-                    print(f"[PRE-APPROVE] Approving admin for asset {asset['asset_code']}")
-                    
-                    # Approve admin using seller's secret key
-                    # expiration_ledger will be calculated automatically (1 year from current)
-                    soroban_service.approve_admin_for_token(
-                        token_contract_id=asset['contract_id'],
-                        owner_address=user_wallet,
-                        amount_i128=approval_amount,
-                        expiration_ledger=None,  # Will be calculated automatically
-                        owner_secret_key=approve_data.secret_key
-                    )
-                    
-                    approved_count += 1
-                    print(f"[PRE-APPROVE] ✓ Approved for {asset['asset_code']}")
-                    
-                except Exception as e:
-                    print(f"[PRE-APPROVE] ERROR: Failed to approve for {asset['asset_code']}: {e}")
-                    failed_assets.append({
-                        "asset_code": asset['asset_code'],
-                        "error": str(e)
-                    })
+            def approve_all():
+                nonlocal approved_count
+                # One ledger lookup covers every approval in this batch
+                expiration_ledger = soroban_service.default_expiration_ledger()
+                for asset in assets:
+                    try:
+                        approval_amount = int(asset['total_supply_stroops']) * APPROVAL_SUPPLY_MULTIPLIER
+                        
+                        logger.debug("[PRE-APPROVE] Approving admin for asset %s", asset['asset_code'])
+                        
+                        # Approve admin using seller's secret key
+                        soroban_service.approve_admin_for_token(
+                            token_contract_id=asset['contract_id'],
+                            owner_address=user_wallet,
+                            amount_i128=approval_amount,
+                            expiration_ledger=expiration_ledger,
+                            owner_secret_key=approve_data.secret_key
+                        )
+                        
+                        approved_count += 1
+                        logger.debug("[PRE-APPROVE] ✓ Approved for %s", asset['asset_code'])
+                        
+                    except Exception as e:
+                        logger.error("[PRE-APPROVE] Failed to approve for %s: %s", asset['asset_code'], e)
+                        failed_assets.append({
+                            "asset_code": asset['asset_code'],
+                            "error": str(e)
+                        })
+            
+            # The approvals share the seller's sequence number, so they run one after another,
+            # on the seller approval worker rather than the event loop
+            await loop.run_in_executor(seller_approval_executor, approve_all)
             
             return {
                 "success": True,
@@ -2268,9 +2783,7 @@ async def approve_admin_for_all_assets(request: Request, approve_data: ApproveAd
             approval_commands = []
             
             for asset in assets:
-                # Calculate approval amount (100x total supply for safety)
-                total_supply_stroops = int(float(asset['total_supply']) * 10000000)
-                approval_amount = total_supply_stroops * 100
+                approval_amount = int(asset['total_supply_stroops']) * APPROVAL_SUPPLY_MULTIPLIER
                 
                 # Build the approval command
                 # Note: Users need to get current ledger first and add 518400 for 30 days expiration
@@ -2307,86 +2820,330 @@ async def approve_admin_for_all_assets(request: Request, approve_data: ApproveAd
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[PRE-APPROVE] ERROR: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("[PRE-APPROVE] %s: %s", type(e).__name__, str(e))
+        logger.debug("Traceback:", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Pre-approval failed: {str(e)}")
+
+
+# Token contract, owner and supply (in stroops) needed to approve the admin for an asset
+SQL_ASSET_FOR_APPROVAL = """
+    SELECT a.contract_id, a.asset_issuer_address, a.total_supply_stroops, a.asset_code
+    FROM assets a
+    WHERE a.id = %s
+"""
+
+
+def get_asset_for_approval(asset_id: int) -> Optional[tuple]:
+    """Return (contract_id, asset_issuer_address, total_supply_stroops, asset_code), or None if the asset does not exist"""
+    with approval_asset_cache_lock:
+        asset = approval_asset_cache.get(asset_id)
+    if asset is not None:
+        return asset
+    
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(SQL_ASSET_FOR_APPROVAL, (asset_id,))
+        asset = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+    
+    if asset:
+        with approval_asset_cache_lock:
+            approval_asset_cache[asset_id] = asset
+    return asset
+
+
+def get_assets_for_approval(asset_ids: List[int]) -> dict:
+    """Load approval fields for several assets with one query, keyed by asset id"""
+    placeholders = ", ".join(["%s"] * len(asset_ids))
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"""
+            SELECT a.id, a.contract_id, a.asset_issuer_address, a.total_supply_stroops, a.asset_code
+            FROM assets a
+            WHERE a.id IN ({placeholders})
+        """, tuple(asset_ids))
+        rows = fetch_all_dicts(cursor)
+        cursor.close()
     finally:
-        if connection and connection.is_connected():
+        connection.close()
+    return {row.pop("id"): row for row in rows}
+
+
+def create_admin_approval(asset_id: int, approval_amount: int) -> tuple:
+    """Record a pending manual approval; returns (approval_id, created), reusing one already pending for the asset"""
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            for attempt in range(2):
+                try:
+                    cursor.execute(
+                        "INSERT INTO admin_approvals (asset_id, pending_asset_id, approval_amount) VALUES (%s, %s, %s)",
+                        (asset_id, asset_id, approval_amount),
+                    )
+                    connection.commit()
+                    return cursor.lastrowid, True
+                except mysql.connector.IntegrityError:
+                    # Another request got there first; coalesce onto its approval
+                    connection.rollback()
+                    cursor.execute("SELECT id FROM admin_approvals WHERE pending_asset_id = %s", (asset_id,))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        return row[0], False
+                    if attempt:
+                        raise
+                    # It finished in the meantime; try again
+        finally:
             cursor.close()
+    finally:
+        connection.close()
+
+
+def finish_admin_approval(approval_id: int, status: str, error: Optional[str] = None):
+    """Record the outcome of a pending approval and release its asset for the next one"""
+    connection = None
+    try:
+        connection = get_db_connection()
+        cursor = connection.cursor()
+        # Only a PENDING row is updated, so an outcome never overwrites one already settled
+        # (e.g. failed by the startup sweep)
+        cursor.execute(
+            """
+            UPDATE admin_approvals SET status = %s, error = %s, pending_asset_id = NULL
+            WHERE id = %s AND status = 'PENDING'
+            """,
+            (status, error, approval_id),
+        )
+        if cursor.rowcount == 0:
+            logger.warning("[APPROVAL] Approval %s was no longer pending; %s not recorded", approval_id, status)
+        connection.commit()
+        cursor.close()
+    except (HTTPException, Error) as e:
+        logger.error("[APPROVAL] Could not record the result of approval %s: %s", approval_id, e)
+    finally:
+        if connection:
             connection.close()
 
 
-@app.post("/admin/assets/{asset_id}/approve-admin")
-async def approve_admin_for_asset(request: Request, asset_id: int):
+def run_manual_approval(approval_id: int, contract_id: str, issuer_address: str, approval_amount: int):
+    """Submit a queued manual approval and record whether it went through (runs on the Soroban worker)"""
+    status, error = "APPROVED", None
+    try:
+        soroban_service = get_soroban_service()
+        # Looked up here rather than by the endpoint; a failed lookup fails just this approval
+        expiration_ledger = soroban_service.default_expiration_ledger()
+        soroban_service.approve_admin_for_token(
+            token_contract_id=contract_id,
+            owner_address=issuer_address,
+            amount_i128=approval_amount,
+            expiration_ledger=expiration_ledger
+        )
+        logger.debug("[MANUAL-APPROVE] ✓ Approval %s confirmed", approval_id)
+    except Exception as e:
+        status, error = "FAILED", str(e)
+        logger.error("[MANUAL-APPROVE] Approval %s failed: %s", approval_id, e,
+                     exc_info=logger.isEnabledFor(logging.DEBUG))
+    
+    finish_admin_approval(approval_id, status, error)
+
+
+@app.post("/admin/assets/{asset_id}/approve-admin", status_code=202)
+async def approve_admin_for_asset(asset_id: int, admin_user: dict = Depends(require_admin)):
     """
     Manually approve admin to transfer tokens for an existing asset.
     This is useful if auto-approval failed during asset creation.
+    The approval is queued; poll /admin/approvals/{approval_id} for the outcome.
     """
-    admin_user = check_admin_role(request)
-    
+    # The lookup and the Soroban call both block, so neither runs on the event loop
+    loop = asyncio.get_running_loop()
+    try:
+        # The expiration ledger is resolved by the worker, so a missing asset or an approval
+        # that is already pending is answered without depending on RPC/Horizon being up
+        asset = await loop.run_in_executor(None, get_asset_for_approval, asset_id)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        contract_id, issuer_address, total_supply_stroops, asset_code = asset
+        
+        logger.debug("[MANUAL-APPROVE] Asset %s: contract %s, issuer %s",
+                     asset_id, contract_id, issuer_address)
+        
+        approval_amount = int(total_supply_stroops) * APPROVAL_SUPPLY_MULTIPLIER
+        logger.debug("[MANUAL-APPROVE] Total supply: %s stroops, approval amount: %s stroops", total_supply_stroops, approval_amount)
+        
+        approval_id, created = await loop.run_in_executor(None, create_admin_approval, asset_id, approval_amount)
+        
+        if created:
+            # Admin-signed, so it queues behind any other admin transaction on the Soroban worker;
+            # the response doesn't wait for the ledger to close
+            soroban_executor.submit(
+                run_manual_approval, approval_id, contract_id, issuer_address, approval_amount
+            )
+        else:
+            logger.debug("[MANUAL-APPROVE] Asset %s already has approval %s pending", asset_id, approval_id)
+        
+        return {
+            "success": True,
+            "message": f"Admin approval {'submitted' if created else 'already pending'} for asset {asset_code}",
+            "approval_id": approval_id,
+            "asset_id": asset_id,
+            "approval_amount": approval_amount,
+            "status": "PENDING"
+        }
+        
+    except HTTPException:
+        raise
+    except Error as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
+    except Exception as e:
+        logger.error("[MANUAL-APPROVE] %s: %s", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail=f"Approval failed: {str(e)}")
+
+
+@app.get("/admin/approvals/{approval_id}")
+def get_admin_approval(approval_id: int, admin_user: dict = Depends(require_admin)):
+    """Status of a manual admin approval"""
     connection = None
     try:
         connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
-        
-        # Get asset details
         cursor.execute("""
-            SELECT a.contract_id, a.asset_issuer_address, a.total_supply, a.asset_code
-            FROM assets a
-            WHERE a.id = %s
-        """, (asset_id,))
+            SELECT id, asset_id, approval_amount, status, error, created_at, updated_at
+            FROM admin_approvals
+            WHERE id = %s
+        """, (approval_id,))
         
-        asset = cursor.fetchone()
-        if not asset:
-            raise HTTPException(status_code=404, detail="Asset not found")
+        approval = cursor.fetchone()
+        if not approval:
+            raise HTTPException(status_code=404, detail="Approval not found")
+        
+        return json_response(approval)
+        
+    except HTTPException:
+        raise
+    except Error as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
+    finally:
+        if connection:
+            try:
+                cursor.close()
+            finally:
+                connection.close()
+
+
+@app.get("/admin/soroban/health")
+def get_soroban_health(admin_user: dict = Depends(require_admin)):
+    """RPC submission counters, success ratio and whether submissions are bypassing RPC for Horizon"""
+    soroban_service = get_soroban_service()
+    return {
+        "network": soroban_service.network,
+        "rpc_configured": bool(soroban_service.rpc_url),
+        "rpc_submissions": soroban_service.rpc_health()
+    }
+
+
+class ApproveBatchRequest(BaseModel):
+    asset_ids: List[int]
+
+
+# Upper bound on assets approved in one batch call
+MAX_APPROVE_BATCH = 50
+
+
+@app.post("/admin/approve-batch")
+async def approve_admin_batch(batch_data: ApproveBatchRequest, admin_user: dict = Depends(require_admin)):
+    """Approve admin to transfer tokens for several assets in one call"""
+    asset_ids = list(dict.fromkeys(batch_data.asset_ids))
+    if not asset_ids:
+        raise HTTPException(status_code=400, detail="asset_ids must not be empty")
+    if len(asset_ids) > MAX_APPROVE_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_APPROVE_BATCH} assets can be approved per batch")
+    
+    loop = asyncio.get_running_loop()
+    try:
+        # One query for the whole batch
+        assets = await loop.run_in_executor(None, get_assets_for_approval, asset_ids)
+        missing_ids = [asset_id for asset_id in asset_ids if asset_id not in assets]
         
-        print(f"[MANUAL-APPROVE] ===== MANUAL APPROVAL REQUEST ======")
-        print(f"[MANUAL-APPROVE] Asset ID: {asset_id}")
-        print(f"[MANUAL-APPROVE] Contract: {asset['contract_id']}")
-        print(f"[MANUAL-APPROVE] Issuer: {asset['asset_issuer_address']}")
+        def reserve_approvals():
+            # Same reservation as the manual endpoint, so an asset never has two approvals in flight
+            reserved, already_pending = {}, []
+            try:
+                for asset_id, asset in assets.items():
+                    approval_amount = int(asset['total_supply_stroops']) * APPROVAL_SUPPLY_MULTIPLIER
+                    approval_id, created = create_admin_approval(asset_id, approval_amount)
+                    if created:
+                        reserved[asset_id] = (approval_id, approval_amount)
+                    else:
+                        already_pending.append({"asset_id": asset_id, "approval_id": approval_id})
+            except Exception as e:
+                # Nothing will run the ones already reserved, so release them
+                for approval_id, _ in reserved.values():
+                    finish_admin_approval(approval_id, "FAILED", str(e))
+                raise
+            return reserved, already_pending
         
-        from soroban_service import SorobanService
-        soroban_service = SorobanService()
+        reserved, already_pending = await loop.run_in_executor(None, reserve_approvals)
         
-        # Calculate approval amount (100x total supply)
-        total_supply_stroops = int(float(asset['total_supply']) * 10000000)
-        approval_amount = total_supply_stroops * 100
+        soroban_service = get_soroban_service()
+        approved_ids = []
+        failed_assets = []
         
-        print(f"[MANUAL-APPROVE] Total supply: {asset['total_supply']} tons = {total_supply_stroops} stroops")
-        print(f"[MANUAL-APPROVE] Approval amount: {approval_amount} stroops")
+        def approve_batch():
+            # Each approval is its own Soroban transaction (one host function per tx),
+            # but they share a single ledger lookup and run back to back on the Soroban worker
+            try:
+                expiration_ledger = soroban_service.default_expiration_ledger()
+            except Exception as e:
+                # Release every reservation rather than leave the assets blocked
+                for approval_id, _ in reserved.values():
+                    finish_admin_approval(approval_id, "FAILED", str(e))
+                raise
+            for asset_id, (approval_id, approval_amount) in reserved.items():
+                asset = assets[asset_id]
+                try:
+                    soroban_service.approve_admin_for_token(
+                        token_contract_id=asset['contract_id'],
+                        owner_address=asset['asset_issuer_address'],
+                        amount_i128=approval_amount,
+                        expiration_ledger=expiration_ledger
+                    )
+                    approved_ids.append(asset_id)
+                    finish_admin_approval(approval_id, "APPROVED")
+                except Exception as e:
+                    logger.error("[BATCH-APPROVE] Failed to approve for %s: %s", asset['asset_code'], e)
+                    failed_assets.append({
+                        "asset_id": asset_id,
+                        "asset_code": asset['asset_code'],
+                        "error": str(e)
+                    })
+                    finish_admin_approval(approval_id, "FAILED", str(e))
         
-        try:
-            soroban_service.approve_admin_for_token(
-                token_contract_id=asset['contract_id'],
-                owner_address=asset['asset_issuer_address'],
-                amount_i128=approval_amount,
-                expiration_ledger=None  # Will be calculated automatically (1 year from current ledger)
-            )
-            
-            print(f"[MANUAL-APPROVE] ✓✓✓ Admin approved successfully ✓✓✓")
-            
-            return {
-                "success": True,
-                "message": f"Admin approved successfully for asset {asset['asset_code']}",
-                "asset_id": asset_id,
-                "approval_amount": approval_amount
-            }
-        except Exception as e:
-            print(f"[MANUAL-APPROVE] ERROR: Approval failed: {e}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"Failed to approve admin: {str(e)}")
+        if reserved:
+            await loop.run_in_executor(soroban_executor, approve_batch)
+        
+        return {
+            "success": True,
+            "message": f"Approved admin for {len(approved_ids)} out of {len(asset_ids)} assets",
+            "approved_asset_ids": approved_ids,
+            "failed_assets": failed_assets,
+            "already_pending": already_pending,
+            "missing_asset_ids": missing_ids
+        }
         
     except HTTPException:
         raise
+    except Error as e:
+        logger.error("Database error: %s", e)
+        raise HTTPException(status_code=500, detail="Database error")
     except Exception as e:
-        print(f"[MANUAL-APPROVE] ERROR: {type(e).__name__}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Approval failed: {str(e)}")
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
+        logger.error("[BATCH-APPROVE] %s: %s", type(e).__name__, str(e))
+        raise HTTPException(status_code=500, detail=f"Batch approval failed: {str(e)}")
 
 
 if __name__ == "__main__":
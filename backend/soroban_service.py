@@ -1,12 +1,94 @@
 """
 Service for deploying Stellar smart contracts
-Uses subprocess to call stellar CLI for reliability
+Talks to Soroban RPC directly via stellar-sdk; falls back to the stellar CLI
+when no STELLAR_RPC_URL is configured
 """
+import functools
+import hashlib
+import json
+import logging
 import os
 import subprocess
 import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal, ROUND_DOWN
 from pathlib import Path
 
+import orjson
+import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from stellar_sdk import Account, Keypair, SorobanServer, StrKey, TransactionBuilder, scval, xdr as stellar_xdr
+from stellar_sdk.client.requests_client import RequestsClient
+from stellar_sdk.exceptions import PrepareTransactionException
+from stellar_sdk.soroban_rpc import GetTransactionStatus, SendTransactionStatus
+
+logger = logging.getLogger("carbon.api.soroban")
+
+# How long to wait for a submitted Soroban transaction to land in a ledger
+TX_POLL_ATTEMPTS = 30
+TX_POLL_INTERVAL = 1
+# A ledger closes every ~5s, so a sequence this fresh is as good as a new lookup for "7 days out"
+LEDGER_CACHE_TTL = 10
+# Balances polled within this many seconds of each other are answered from memory
+BALANCE_CACHE_TTL = 3
+# After this many consecutive RPC submission failures, submit straight to Horizon for the cool-down
+RPC_BREAKER_THRESHOLD = 5
+RPC_BREAKER_COOLDOWN = 30
+
+# Fallback for CLI versions that decorate the deployed contract ID ("Contract ID: C...")
+CONTRACT_ID_RE = re.compile(r'\b(C[A-Z2-7]{55})\b')
+
+# Public RPC endpoints for read-only queries (balances) when STELLAR_RPC_URL isn't set
+DEFAULT_RPC_URLS = {
+    "testnet": "https://soroban-testnet.stellar.org",
+    "futurenet": "https://rpc-futurenet.stellar.org",
+}
+
+# Envelope shared by every sendTransaction call; only params change per submission
+SEND_TRANSACTION_REQUEST = {"jsonrpc": "2.0", "id": 1, "method": "sendTransaction"}
+
+# Absolute CLI path: with it (and close_fds=False) subprocess can spawn via posix_spawn instead of fork+exec.
+# Our own fds are non-inheritable (PEP 446), so not closing them in the child leaks nothing.
+STELLAR_CLI = shutil.which("stellar") or "stellar"
+
+
+class SubmissionRejectedError(Exception):
+    """The network definitively rejected a submitted transaction; resubmitting elsewhere won't help"""
+
+
+def transaction_result_code(result_xdr) -> str:
+    """Result code name (e.g. txBAD_SEQ) from a TransactionResult XDR, or the raw value if it can't be decoded"""
+    try:
+        return stellar_xdr.TransactionResult.from_xdr(result_xdr).result.code.name
+    except Exception:
+        return str(result_xdr)
+
+
+def redacted_argv(cmd) -> str:
+    """Command line for logging, with secret seeds (56-char S... strkeys, e.g. an approve --source) masked"""
+    return ' '.join("S***" if len(arg) == 56 and arg[0] == "S" else arg for arg in cmd)
+
+
+class TransactionPendingError(Exception):
+    """A submitted transaction was not seen in a ledger in time; it may still apply, so don't resubmit"""
+
+
+@functools.lru_cache(maxsize=8)
+def resolve_token_wasm_path(path_str: str) -> str:
+    """Absolute WASM path (relative paths are taken from the repo root); resolved and checked once per process"""
+    wasm_path = Path(path_str)
+    if not wasm_path.is_absolute():
+        wasm_path = Path(__file__).parent.parent / wasm_path
+    wasm_path = str(wasm_path.resolve())
+    if not os.path.exists(wasm_path):
+        raise FileNotFoundError(f"WASM file not found: {wasm_path}")
+    return wasm_path
+
 
 class SorobanService:
     def __init__(self):
@@ -15,8 +97,73 @@ class SorobanService:
         self.admin_secret = os.getenv("ADMIN_SECRET_KEY")
         # Support both CARBON_CONTROLLER_ADDRESS and CARBON_CONTROLLER_ID
         self.carbon_controller_address = os.getenv("CARBON_CONTROLLER_ADDRESS") or os.getenv("CARBON_CONTROLLER_ID")
-        self.token_wasm_path = os.getenv("TOKEN_WASM_PATH", "../soroban-examples/token/target/wasm32v1-none/release/soroban_token_contract.wasm")
+        # Checked first so a bad path fails before any connections are set up
+        self.token_wasm_path = resolve_token_wasm_path(
+            os.getenv("TOKEN_WASM_PATH", "../soroban-examples/token/target/wasm32v1-none/release/soroban_token_contract.wasm")
+        )
         self.rpc_url = os.getenv("STELLAR_RPC_URL")
+        self.horizon_url = "https://horizon-testnet.stellar.org" if self.network == "testnet" else "https://horizon.stellar.org"
+        # (connect, read) timeouts for submissions: a dead endpoint fails fast instead of holding the worker 30s
+        self.connect_timeout = float(os.getenv("STELLAR_CONNECT_TIMEOUT", "3"))
+        self.read_timeout = float(os.getenv("STELLAR_READ_TIMEOUT", "20"))
+        
+        # One keep-alive session for every RPC/Horizon call, so repeat calls skip the TCP+TLS handshake
+        self.http = requests.Session()
+        # Transient failures (connection errors, 429/5xx) are retried with jittered exponential
+        # backoff. POSTs are included because on this session they are all JSON-RPC reads
+        # (simulate, getLedgerEntries, getLatestLedger); submissions use self.submit_http
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            backoff_jitter=0.3,
+            backoff_max=5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        # Submissions are never re-sent after the request may have reached the server: if the first
+        # attempt was applied, a resend fails with tx_bad_seq and a landed transaction looks failed.
+        # Only connection failures (nothing was sent) are retried.
+        self.submit_http = requests.Session()
+        submit_adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.3, raise_on_status=False)
+        )
+        self.submit_http.mount("https://", submit_adapter)
+        self.submit_http.mount("http://", submit_adapter)
+        
+        # In-process RPC client on the same keep-alive session; None means every contract call goes through the CLI
+        self.soroban_server = SorobanServer(self.rpc_url, client=RequestsClient(session=self.http)) if self.rpc_url else None
+        # Same endpoint, but sendTransaction goes over the no-retry session
+        self._submit_server = SorobanServer(self.rpc_url, client=RequestsClient(session=self.submit_http)) if self.rpc_url else None
+        # Reads never need the CLI: without a configured RPC they use the network's public endpoint
+        read_rpc_url = DEFAULT_RPC_URLS.get(self.network)
+        if self.soroban_server:
+            self.read_server = self.soroban_server
+        elif read_rpc_url:
+            self.read_server = SorobanServer(read_rpc_url, client=RequestsClient(session=self.http))
+        else:
+            self.read_server = None
+        self._token_wasm_id = None
+        # Overlaps independent read-only RPC round trips (never used for submitting)
+        self._rpc_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="soroban-rpc")
+        # (monotonic fetch time, ledger sequence) of the last successful lookup
+        self._ledger_cache = (0.0, None)
+        self._ledger_cache_lock = threading.Lock()
+        # (contract, address) -> balance; concurrent misses for one key share a single fetch
+        self._balance_cache = TTLCache(maxsize=4096, ttl=BALANCE_CACHE_TTL)
+        self._balance_cache_lock = threading.Lock()
+        self._balance_fetch_locks = {}
+        # Circuit breaker for RPC submissions: a dead node shouldn't cost every submit a connect timeout
+        self._rpc_breaker_lock = threading.Lock()
+        self._rpc_failures = 0
+        self._rpc_open_until = 0.0
+        self._rpc_submissions = {"ok": 0, "failed": 0, "skipped": 0}
         
         # Network passphrases for Stellar networks
         network_passphrases = {
@@ -28,17 +175,107 @@ class SorobanService:
         
         if not self.admin_secret:
             raise ValueError("ADMIN_SECRET_KEY environment variable is required")
+        # Decode the admin key once; every signing and address lookup reuses it
+        self.admin_keypair = Keypair.from_secret(self.admin_secret)
+        self.admin_address = self.admin_keypair.public_key
+        
+        # Environment for CLI subprocesses, built once: admin key and network passphrase on top of ours
+        self._cli_env = {**os.environ, "STELLAR_SECRET_KEY": self.admin_secret}
+        if self.network_passphrase:
+            self._cli_env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
         # Note: CARBON_CONTROLLER_ADDRESS/CARBON_CONTROLLER_ID is optional - only needed for registration
         
-        # Resolve WASM path relative to backend directory
-        backend_dir = Path(__file__).parent
-        wasm_path = Path(self.token_wasm_path)
-        if not wasm_path.is_absolute():
-            wasm_path = backend_dir.parent / wasm_path
-        self.token_wasm_path = str(wasm_path.resolve())
+        if not self.soroban_server:
+            self._register_cli_identity()
+    
+    def _register_cli_identity(self):
+        """Store the admin key as the CLI's `admin` identity once, so invokes don't re-resolve it from env"""
+        try:
+            result = subprocess.run(
+                [STELLAR_CLI, "keys", "add", "admin", "--secret-key"],
+                close_fds=False,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                env=self._cli_env
+            )
+            if result.returncode != 0:
+                # Usually means the identity already exists
+                logger.debug("[SOROBAN] stellar keys add admin: %s", result.stderr.strip())
+        except FileNotFoundError:
+            logger.warning("[SOROBAN] stellar CLI not found; contract calls will fail until it is installed")
+    
+    def close(self):
+        """Release the pooled HTTP connections"""
+        self.http.close()
+        self.submit_http.close()
+        self._rpc_pool.shutdown(wait=False)
+        if self.soroban_server:
+            self.soroban_server.close()
+    
+    def _installed_token_wasm_id(self):
+        """Hash of the token WASM if its code entry is already live on the network, else None"""
+        wasm_hash = hashlib.sha256(Path(self.token_wasm_path).read_bytes()).digest()
+        code_key = stellar_xdr.LedgerKey(
+            type=stellar_xdr.LedgerEntryType.CONTRACT_CODE,
+            contract_code=stellar_xdr.LedgerKeyContractCode(hash=stellar_xdr.Hash(wasm_hash))
+        )
+        response = self.soroban_server.get_ledger_entries([code_key])
+        for entry in response.entries or []:
+            if entry.live_until_ledger is None or entry.live_until_ledger >= response.latest_ledger:
+                return wasm_hash
+        return None
+    
+    def _cli_network_args(self):
+        """--rpc-url/--network-passphrase (when a custom RPC is set) followed by --network"""
+        if self.rpc_url:
+            return ["--rpc-url", self.rpc_url, "--network-passphrase", self.network_passphrase, "--network", self.network]
+        return ["--network", self.network]
+    
+    def _base_invoke_cmd(self, contract_id: str, source: str = "admin"):
+        """`stellar contract invoke` argv up to (not including) the `--` before the function"""
+        return [STELLAR_CLI, "contract", "invoke", "--id", contract_id, "--source", source] + self._cli_network_args()
+    
+    def _base_deploy_cmd(self):
+        """`stellar contract deploy` argv for the token WASM, up to the constructor `--`"""
+        return [STELLAR_CLI, "contract", "deploy", "--wasm", self.token_wasm_path, "--source", "admin"] + self._cli_network_args()
+    
+    def _send_soroban_transaction(self, signer: Keypair, append_op, source=None):
+        """
+        Build a single-operation Soroban transaction from signer's account, simulate it
+        to fill in footprint/auth/fees, sign, submit and wait for it to be applied.
+        Returns the host function's return value (SCVal).
+        source may be the signer's already-loaded account.
+        """
+        source = source or self.soroban_server.load_account(signer.public_key)
+        builder = TransactionBuilder(source, self.network_passphrase, base_fee=100).set_timeout(60)
+        append_op(builder)
+        tx = self.soroban_server.prepare_transaction(builder.build())
+        tx.sign(signer)
         
-        if not os.path.exists(self.token_wasm_path):
-            raise FileNotFoundError(f"WASM file not found: {self.token_wasm_path}")
+        sent = self._submit_server.send_transaction(tx)
+        if sent.status != SendTransactionStatus.PENDING:
+            raise Exception(f"Transaction {sent.hash} rejected ({sent.status.value}): {sent.error_result_xdr}")
+        
+        for _ in range(TX_POLL_ATTEMPTS):
+            response = self.soroban_server.get_transaction(sent.hash)
+            if response.status == GetTransactionStatus.SUCCESS:
+                meta = stellar_xdr.TransactionMeta.from_xdr(response.result_meta_xdr)
+                return getattr(meta, f"v{meta.v}").soroban_meta.return_value
+            if response.status == GetTransactionStatus.FAILED:
+                raise Exception(f"Transaction {sent.hash} failed: {response.result_xdr}")
+            time.sleep(TX_POLL_INTERVAL)
+        raise TransactionPendingError(f"Transaction {sent.hash} not confirmed after {TX_POLL_ATTEMPTS * TX_POLL_INTERVAL}s")
+    
+    def _invoke_contract(self, contract_id: str, function_name: str, parameters, signer: Keypair = None, source=None):
+        """Invoke a contract function over RPC, signed by signer (admin by default)"""
+        signer = signer or self.admin_keypair
+        return self._send_soroban_transaction(
+            signer,
+            lambda builder: builder.append_invoke_contract_function_op(contract_id, function_name, parameters),
+            source=source
+        )
     
     def deploy_token_contract(
         self, 
@@ -57,15 +294,41 @@ class SorobanService:
             symbol = f"{project_identifier}_{vintage_year}"
             name = f"{project_identifier} {vintage_year}"  # Name can have spaces
             
+            if self.soroban_server:
+                admin_keypair = self.admin_keypair
+                # Upload the token WASM at most once per process, and not at all if the
+                # network already holds live code with the same hash
+                if self._token_wasm_id is None:
+                    self._token_wasm_id = self._installed_token_wasm_id()
+                if self._token_wasm_id is None:
+                    logger.debug("Uploading token WASM: %s", self.token_wasm_path)
+                    wasm_id = self._send_soroban_transaction(
+                        admin_keypair,
+                        lambda builder: builder.append_upload_contract_wasm_op(self.token_wasm_path)
+                    )
+                    self._token_wasm_id = scval.from_bytes(wasm_id)
+                
+                logger.debug("Deploying contract %s via RPC", symbol)
+                contract_address = self._send_soroban_transaction(
+                    admin_keypair,
+                    lambda builder: builder.append_create_contract_op(
+                        self._token_wasm_id,
+                        admin_keypair.public_key,
+                        constructor_args=[
+                            scval.to_address(admin_address),
+                            scval.to_uint32(decimal),
+                            scval.to_string(name),
+                            scval.to_string(symbol),
+                        ]
+                    )
+                )
+                contract_address = scval.from_address(contract_address).address
+                logger.info("Contract deployed successfully. Address: %s", contract_address)
+                return contract_address
+            
             # Build the stellar contract deploy command
             # Format: stellar contract deploy --wasm <path> --source admin --network testnet -- --admin <addr> --decimal 7 --name "NAME" --symbol "SYMBOL"
-            cmd = [
-                "stellar",
-                "contract",
-                "deploy",
-                "--wasm", self.token_wasm_path,
-                "--source", "admin",
-                "--network", self.network,
+            cmd = self._base_deploy_cmd() + [
                 "--",
                 "--admin", admin_address,
                 "--decimal", str(decimal),
@@ -73,33 +336,18 @@ class SorobanService:
                 "--symbol", symbol
             ]
             
-            # Set environment variables
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            # If using custom RPC URL, add it and network passphrase to command
-            if self.rpc_url:
-                # Insert --rpc-url and --network-passphrase before --network
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            # Always set network passphrase in environment (CLI may need it)
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
-            print(f"Deploying contract with command: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Deploying contract with command: %s", redacted_argv(cmd))
             
             # Run the command with UTF-8 encoding to handle special characters
             result = subprocess.run(
                 cmd,
+                close_fds=False,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
                 errors='replace',  # Replace problematic characters instead of failing
-                env=env,
+                env=self._cli_env,
                 cwd=os.path.dirname(self.token_wasm_path) or "."
             )
             
@@ -107,27 +355,23 @@ class SorobanService:
                 error_msg = result.stderr or result.stdout
                 raise Exception(f"Contract deployment failed: {error_msg}")
             
-            # Extract contract address from output
-            # The output format is typically: "Contract ID: C..."
-            output = result.stdout
-            contract_id_match = re.search(r'Contract ID:\s*([A-Z0-9]+)', output)
-            if contract_id_match:
-                contract_address = contract_id_match.group(1)
+            # The CLI prints the bare contract ID on stdout (progress goes to stderr)
+            output = result.stdout.strip()
+            if StrKey.is_valid_contract(output):
+                contract_address = output
             else:
-                # Try alternative pattern
-                contract_id_match = re.search(r'([A-Z0-9]{56})', output)
-                if contract_id_match:
-                    contract_address = contract_id_match.group(1)
-                else:
+                contract_id_match = CONTRACT_ID_RE.search(output)
+                if not contract_id_match:
                     raise Exception(f"Could not extract contract address from output: {output}")
+                contract_address = contract_id_match.group(1)
             
-            print(f"Contract deployed successfully. Address: {contract_address}")
+            logger.info("Contract deployed successfully. Address: %s", contract_address)
             return contract_address
             
         except FileNotFoundError:
             raise Exception("stellar CLI not found. Please install Stellar CLI.")
         except Exception as e:
-            print(f"Error deploying contract: {e}")
+            logger.error("Error deploying contract: %s", e)
             raise
     
     def register_asset_in_controller(
@@ -143,14 +387,24 @@ class SorobanService:
             raise ValueError("CARBON_CONTROLLER_ADDRESS or CARBON_CONTROLLER_ID environment variable is required for asset registration")
         
         try:
+            if self.soroban_server:
+                logger.debug("Registering asset %s via RPC", asset_code)
+                self._invoke_contract(
+                    self.carbon_controller_address,
+                    "register_asset",
+                    [
+                        scval.to_symbol(asset_code),
+                        scval.to_int64(project_id),
+                        scval.to_int32(vintage_year),
+                        scval.to_address(token_address),
+                        scval.to_address(admin_address),
+                    ]
+                )
+                logger.info("Asset registered successfully in carbon controller")
+                return True
+            
             # Build the stellar contract invoke command
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", self.carbon_controller_address,
-                "--source", "admin",
-                "--network", self.network,
+            cmd = self._base_invoke_cmd(self.carbon_controller_address) + [
                 "--",
                 "register_asset",
                 "--asset_code", asset_code,
@@ -160,72 +414,73 @@ class SorobanService:
                 "--admin", admin_address
             ]
             
-            # Set environment variables
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            # If using custom RPC URL, add it and network passphrase to command
-            if self.rpc_url:
-                # Insert --rpc-url and --network-passphrase before --network
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            # Always set network passphrase in environment (CLI may need it)
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
-            print(f"Registering asset with command: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Registering asset with command: %s", redacted_argv(cmd))
             
-            # Run the command with UTF-8 encoding to handle special characters
+            # Only the exit status matters on success: discard stdout and keep stderr
+            # as raw bytes, decoding it (UTF-8, replacing bad characters) only on failure
             result = subprocess.run(
                 cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Replace problematic characters instead of failing
-                env=env
+                close_fds=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=self._cli_env
             )
             
             if result.returncode != 0:
-                error_msg = result.stderr or result.stdout
+                error_msg = result.stderr.decode('utf-8', errors='replace')
                 raise Exception(f"Asset registration failed: {error_msg}")
             
-            print("Asset registered successfully in carbon controller")
+            logger.info("Asset registered successfully in carbon controller")
             return True
             
         except FileNotFoundError:
             raise Exception("stellar CLI not found. Please install Stellar CLI.")
         except Exception as e:
-            print(f"Error registering asset: {e}")
+            logger.error("Error registering asset: %s", e)
             raise
     
     def mint_to_issuer(
         self,
         asset_code: str,
         issuer_address: str,
-        amount: float
+        amount,
+        token_contract_id: str = None
     ):
-        """Mint tokens to the issuer using the carbon controller contract"""
+        """
+        Mint tokens to the issuer using the carbon controller contract.
+        Pass the asset's token_contract_id to drop the recipient's cached balance once minted.
+        """
         if not self.carbon_controller_address:
             raise ValueError("CARBON_CONTROLLER_ADDRESS or CARBON_CONTROLLER_ID environment variable is required for minting")
         
         try:
             # Build the stellar contract invoke command
             # Convert amount to i128 (multiply by 10^7 for 7 decimals)
-            # amount is a float (e.g., 1000.0), convert to smallest unit
-            amount_i128 = int(amount * 10_000_000)  # 7 decimals
-            print(f"Converting {amount} to {amount_i128} (smallest unit with 7 decimals)")
-            
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", self.carbon_controller_address,
-                "--source", "admin",
-                "--network", self.network,
+            # Whole tonnage scales exactly as an int; anything else (Decimal, str, float) is scaled
+            # in Decimal so no stroop is lost to float rounding
+            if isinstance(amount, int):
+                amount_i128 = amount * 10_000_000
+            else:
+                amount_i128 = int((Decimal(str(amount)) * 10_000_000).to_integral_value(rounding=ROUND_DOWN))  # 7 decimals
+            logger.debug("Converting %s to %s (smallest unit with 7 decimals)", amount, amount_i128)
+            
+            if self.soroban_server:
+                self._invoke_contract(
+                    self.carbon_controller_address,
+                    "mint_to_issuer",
+                    [
+                        scval.to_symbol(asset_code),
+                        scval.to_address(issuer_address),
+                        scval.to_int128(amount_i128),
+                    ]
+                )
+                if token_contract_id:
+                    self._forget_balances(token_contract_id, issuer_address)
+                logger.info("Successfully minted %s tokens to %s", amount, issuer_address)
+                return True
+            
+            cmd = self._base_invoke_cmd(self.carbon_controller_address) + [
                 "--",
                 "mint_to_issuer",
                 "--asset_code", asset_code,
@@ -233,46 +488,32 @@ class SorobanService:
                 "--amount", str(amount_i128)
             ]
             
-            # Set environment variables
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            # If using custom RPC URL, add it and network passphrase to command
-            if self.rpc_url:
-                # Insert --rpc-url and --network-passphrase before --network
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            # Always set network passphrase in environment (CLI may need it)
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Minting tokens with command: %s", redacted_argv(cmd))
             
-            print(f"Minting tokens with command: {' '.join(cmd)}")
-            
-            # Run the command with UTF-8 encoding to handle special characters
+            # Only the exit status matters on success: discard stdout and keep stderr
+            # as raw bytes, decoding it (UTF-8, replacing bad characters) only on failure
             result = subprocess.run(
                 cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Replace problematic characters instead of failing
-                env=env
+                close_fds=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=self._cli_env
             )
             
             if result.returncode != 0:
-                error_msg = result.stderr or result.stdout
+                error_msg = result.stderr.decode('utf-8', errors='replace')
                 raise Exception(f"Token minting failed: {error_msg}")
             
-            print(f"Successfully minted {amount} tokens to {issuer_address}")
+            if token_contract_id:
+                self._forget_balances(token_contract_id, issuer_address)
+            logger.info("Successfully minted %s tokens to %s", amount, issuer_address)
             return True
             
         except FileNotFoundError:
             raise Exception("stellar CLI not found. Please install Stellar CLI.")
         except Exception as e:
-            print(f"Error minting tokens: {e}")
+            logger.error("Error minting tokens: %s", e)
             raise
     
     def deploy_and_register(
@@ -282,7 +523,7 @@ class SorobanService:
         project_id: int,
         admin_address: str,
         issuer_address: str,
-        quantity: float,
+        quantity,
         decimal: int = 7
     ):
         """
@@ -290,7 +531,7 @@ class SorobanService:
         Returns the contract address.
         """
         # Step 1: Deploy token contract
-        print(f"Step 1: Deploying token contract for {project_identifier}-{vintage_year}...")
+        logger.debug("Step 1: Deploying token contract for %s-%s...", project_identifier, vintage_year)
         contract_address = self.deploy_token_contract(
             project_identifier=project_identifier,
             vintage_year=vintage_year,
@@ -303,7 +544,7 @@ class SorobanService:
         # Symbol type only accepts alphanumeric and underscore characters
         asset_code = f"{project_identifier}-{vintage_year}".replace("-", "_")
         if self.carbon_controller_address:
-            print(f"Step 2: Registering asset in carbon controller...")
+            logger.debug("Step 2: Registering asset in carbon controller...")
             try:
                 self.register_asset_in_controller(
                     asset_code=asset_code,
@@ -314,36 +555,105 @@ class SorobanService:
                 )
                 
                 # Step 3: Mint tokens to issuer
-                print(f"Step 3: Minting {quantity} tokens to issuer {issuer_address}...")
+                logger.debug("Step 3: Minting %s tokens to issuer %s...", quantity, issuer_address)
                 try:
                     self.mint_to_issuer(
                         asset_code=asset_code,
                         issuer_address=issuer_address,
-                        amount=float(quantity)
+                        amount=quantity
                     )
-                    print(f"✓ Successfully minted {quantity} tokens to {issuer_address}")
+                    logger.info("✓ Successfully minted %s tokens to %s", quantity, issuer_address)
                 except Exception as e:
                     error_msg = str(e)
-                    print(f"✗ ERROR: Failed to mint tokens to issuer: {error_msg}")
-                    print("Contract was deployed and registered, but minting failed.")
-                    print("You may need to mint tokens manually using the carbon controller.")
+                    logger.error("✗ Failed to mint tokens to issuer: %s", error_msg)
+                    logger.error("Contract was deployed and registered, but minting failed.")
+                    logger.warning("You may need to mint tokens manually using the carbon controller.")
                     # Re-raise the exception so the caller knows minting failed
                     raise Exception(f"Minting failed: {error_msg}")
             except Exception as e:
-                print(f"Warning: Failed to register asset in carbon controller: {e}")
-                print("Contract was deployed successfully, but registration failed.")
+                logger.warning("Failed to register asset in carbon controller: %s", e)
+                logger.warning("Contract was deployed successfully, but registration failed.")
                 # Continue anyway - contract is deployed
         else:
-            print("Step 2: Skipping carbon controller registration (CARBON_CONTROLLER_ADDRESS/CARBON_CONTROLLER_ID not set)")
-            print("Step 3: Skipping token minting (requires carbon controller)")
+            logger.info("Step 2: Skipping carbon controller registration (CARBON_CONTROLLER_ADDRESS/CARBON_CONTROLLER_ID not set)")
+            logger.info("Step 3: Skipping token minting (requires carbon controller)")
         
         return contract_address
     
     def get_admin_address(self):
         """Get admin public address from secret key"""
-        from stellar_sdk import Keypair
-        admin_keypair = Keypair.from_secret(self.admin_secret)
-        return admin_keypair.public_key
+        return self.admin_address
+    
+    def _ledger_from_rpc(self):
+        """Latest ledger sequence via RPC getLatestLedger, or None"""
+        rpc_response = self.http.post(
+            self.rpc_url,
+            json={
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "getLatestLedger"
+            },
+            timeout=(self.connect_timeout, 10)
+        )
+        if rpc_response.status_code == 200:
+            rpc_data = orjson.loads(rpc_response.content)
+            if "result" in rpc_data and "sequence" in rpc_data["result"]:
+                return int(rpc_data["result"]["sequence"])
+        return None
+    
+    def _ledger_from_horizon(self):
+        """Latest ledger sequence via Horizon, or None"""
+        # /fee_stats is a small fixed-size document that carries the last closed ledger
+        fee_stats = orjson.loads(self.http.get(f"{self.horizon_url}/fee_stats", timeout=(self.connect_timeout, 5)).content)
+        if fee_stats.get("last_ledger"):
+            return int(fee_stats["last_ledger"])
+        return None
+    
+    def _current_ledger(self):
+        """Latest ledger sequence from RPC or Horizon, reused for LEDGER_CACHE_TTL seconds"""
+        with self._ledger_cache_lock:
+            fetched_at, cached_ledger = self._ledger_cache
+            if cached_ledger is not None and time.monotonic() - fetched_at < LEDGER_CACHE_TTL:
+                return cached_ledger
+            
+            # Ask both sources at once and take whichever answers first, so a slow or
+            # degraded RPC costs min(RPC, Horizon) instead of RPC timeout + Horizon
+            sources = {self._rpc_pool.submit(self._ledger_from_horizon): "Horizon"}
+            if self.rpc_url:
+                sources[self._rpc_pool.submit(self._ledger_from_rpc)] = "RPC"
+            
+            current_ledger = None
+            for future in as_completed(sources):
+                try:
+                    current_ledger = future.result()
+                except Exception as query_error:
+                    logger.warning("[SOROBAN] %s ledger query failed: %s", sources[future], query_error)
+                    continue
+                if current_ledger is not None:
+                    logger.debug("[SOROBAN] Got current ledger from %s: %s", sources[future], current_ledger)
+                    break
+            
+            if current_ledger is None:
+                raise Exception("Could not get current ledger from RPC or Horizon API")
+            
+            self._ledger_cache = (time.monotonic(), current_ledger)
+            return current_ledger
+    
+    def default_expiration_ledger(self):
+        """Return an approval expiration ledger ~7 days past the current ledger"""
+        try:
+            current_ledger = self._current_ledger()
+            
+            # Add 7 days (120,960 ledgers) to current ledger for a safe expiration
+            # This is much safer and should work within network limits
+            expiration_ledger = current_ledger + 120960  # 7 days
+            logger.debug("[SOROBAN] Current ledger: %s, Expiration: %s (~7 days)", current_ledger, expiration_ledger)
+            
+        except Exception as e:
+            error_msg = f"Error getting current ledger: {str(e)}"
+            logger.error("[SOROBAN] %s", error_msg)
+            raise Exception(f"{error_msg}. Cannot set expiration without current ledger.")
+        return expiration_ledger
     
     def approve_admin_for_token(
         self,
@@ -364,13 +674,13 @@ class SorobanService:
             expiration_ledger: Expiration ledger (default: very large number)
             owner_secret_key: Optional secret key for the owner. If not provided and owner != admin, will fail.
         """
-        print(f"[SOROBAN] ===== APPROVE ADMIN REQUEST ======")
-        print(f"[SOROBAN] Token Contract: {token_contract_id}")
-        print(f"[SOROBAN] Owner: {owner_address}")
-        print(f"[SOROBAN] Amount: {amount_i128} (smallest units)")
+        logger.debug("[SOROBAN] ===== APPROVE ADMIN REQUEST ======")
+        logger.debug("[SOROBAN] Token Contract: %s", token_contract_id)
+        logger.debug("[SOROBAN] Owner: %s", owner_address)
+        logger.debug("[SOROBAN] Amount: %s (smallest units)", amount_i128)
         
         admin_address = self.get_admin_address()
-        print(f"[SOROBAN] Admin (spender) address: {admin_address}")
+        logger.debug("[SOROBAN] Admin (spender) address: %s", admin_address)
         
         # Calculate expiration ledger
         # Each ledger is ~5 seconds, so:
@@ -378,87 +688,51 @@ class SorobanService:
         # - 1 year = ~6,307,200 ledgers
         # Stellar network has limits on how far we can extend TTL
         # We need to get current ledger and add a reasonable amount
-        if expiration_ledger is None:
-            try:
-                # Get current ledger using Horizon API or RPC
-                current_ledger = None
-                
-                # Try RPC first if available
-                if self.rpc_url:
-                    try:
-                        import requests
-                        rpc_response = requests.post(
-                            self.rpc_url,
-                            json={
-                                "jsonrpc": "2.0",
-                                "id": 1,
-                                "method": "getLatestLedger"
-                            },
-                            timeout=10
-                        )
-                        if rpc_response.status_code == 200:
-                            rpc_data = rpc_response.json()
-                            if "result" in rpc_data and "sequence" in rpc_data["result"]:
-                                current_ledger = int(rpc_data["result"]["sequence"])
-                                print(f"[SOROBAN] Got current ledger from RPC: {current_ledger}")
-                    except Exception as rpc_error:
-                        print(f"[SOROBAN] RPC query failed: {rpc_error}, trying Horizon API...")
-                
-                # Fallback to Horizon API
-                if current_ledger is None:
-                    try:
-                        from stellar_sdk import Server
-                        horizon_url = "https://horizon-testnet.stellar.org" if self.network == "testnet" else "https://horizon.stellar.org"
-                        server = Server(horizon_url=horizon_url)
-                        # Get latest ledger from Horizon
-                        ledgers = server.ledgers().order(desc=True).limit(1).call()
-                        if ledgers and "_embedded" in ledgers and "records" in ledgers["_embedded"]:
-                            if len(ledgers["_embedded"]["records"]) > 0:
-                                current_ledger = int(ledgers["_embedded"]["records"][0]["sequence"])
-                                print(f"[SOROBAN] Got current ledger from Horizon: {current_ledger}")
-                    except Exception as horizon_error:
-                        print(f"[SOROBAN] Horizon API query failed: {horizon_error}")
-                
-                if current_ledger is None:
-                    raise Exception("Could not get current ledger from RPC or Horizon API")
-                
-                # Add 7 days (120,960 ledgers) to current ledger for a safe expiration
-                # This is much safer and should work within network limits
-                expiration_ledger = current_ledger + 120960  # 7 days
-                print(f"[SOROBAN] Current ledger: {current_ledger}, Expiration: {expiration_ledger} (~7 days)")
-                
-            except Exception as e:
-                error_msg = f"Error getting current ledger: {str(e)}"
-                print(f"[SOROBAN] {error_msg}")
-                raise Exception(f"{error_msg}. Cannot set expiration without current ledger.")
-        
-        print(f"[SOROBAN] Expiration ledger: {expiration_ledger}")
+        # (the RPC path below looks it up while the signer's account loads)
+        if expiration_ledger is None and not self.soroban_server:
+            expiration_ledger = self.default_expiration_ledger()
+            logger.debug("[SOROBAN] Expiration ledger: %s", expiration_ledger)
         
         try:
             # Determine which secret key to use for signing
             source_key = None
             if owner_address == admin_address:
                 source_key = self.admin_secret
-                print(f"[SOROBAN] Owner is admin, using admin secret key for approval")
+                logger.debug("[SOROBAN] Owner is admin, using admin secret key for approval")
             elif owner_secret_key:
                 source_key = owner_secret_key
-                print(f"[SOROBAN] Using provided owner secret key for approval")
+                logger.debug("[SOROBAN] Using provided owner secret key for approval")
             else:
                 # This shouldn't happen if issuer is always admin, but handle it gracefully
-                print(f"[SOROBAN] WARNING: Owner ({owner_address}) is not admin ({admin_address})")
-                print(f"[SOROBAN] No owner secret key provided. This will likely fail.")
-                print(f"[SOROBAN] Attempting to use admin key anyway (may fail if contract requires owner signature)...")
+                logger.warning("[SOROBAN] Owner (%s) is not admin (%s)", owner_address, admin_address)
+                logger.warning("[SOROBAN] No owner secret key provided. This will likely fail.")
+                logger.warning("[SOROBAN] Attempting to use admin key anyway (may fail if contract requires owner signature)...")
                 source_key = self.admin_secret
             
+            if self.soroban_server:
+                signer = self.admin_keypair if source_key == self.admin_secret else Keypair.from_secret(source_key)
+                source_future = self._rpc_pool.submit(self.soroban_server.load_account, signer.public_key)
+                if expiration_ledger is None:
+                    expiration_ledger = self.default_expiration_ledger()
+                logger.debug("[SOROBAN] Expiration ledger: %s", expiration_ledger)
+                self._invoke_contract(
+                    token_contract_id,
+                    "approve",
+                    [
+                        scval.to_address(owner_address),
+                        scval.to_address(admin_address),
+                        scval.to_int128(amount_i128),
+                        scval.to_uint32(expiration_ledger),
+                    ],
+                    signer=signer,
+                    source=source_future.result()
+                )
+                logger.info("[SOROBAN] ✓ Admin approved successfully")
+                return True
+            
             # Use secret key as source (CLI accepts secret key starting with 'S' as source)
             # This allows the CLI to sign the transaction
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", token_contract_id,
-                "--source", source_key,  # Use secret key directly as source for signing
-                "--network", self.network,
+            cmd = self._base_invoke_cmd(token_contract_id, source=source_key) + [
                 "--",
                 "approve",
                 "--from", owner_address,  # This is the owner's public address (for the contract call)
@@ -467,23 +741,14 @@ class SorobanService:
                 "--expiration-ledger", str(expiration_ledger)
             ]
             
-            env = os.environ.copy()
             # Also set in environment as backup (though --source should handle it)
-            env["STELLAR_SECRET_KEY"] = source_key
-            
-            if self.rpc_url:
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
+            env = self._cli_env if source_key == self.admin_secret else {**self._cli_env, "STELLAR_SECRET_KEY": source_key}
             
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
-            print(f"[SOROBAN] Executing command: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[SOROBAN] Executing command: %s", redacted_argv(cmd))
             result = subprocess.run(
                 cmd,
+                close_fds=False,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
@@ -491,23 +756,22 @@ class SorobanService:
                 env=env
             )
             
-            print(f"[SOROBAN] Command return code: {result.returncode}")
-            print(f"[SOROBAN] Command stdout: {result.stdout}")
+            logger.debug("[SOROBAN] Command return code: %s", result.returncode)
+            logger.debug("[SOROBAN] Command stdout: %s", result.stdout)
             if result.stderr:
-                print(f"[SOROBAN] Command stderr: {result.stderr}")
+                logger.debug("[SOROBAN] Command stderr: %s", result.stderr)
             
             if result.returncode != 0:
                 error_msg = result.stderr or result.stdout
-                print(f"[SOROBAN] ERROR: Approval failed: {error_msg}")
+                logger.error("[SOROBAN] Approval failed: %s", error_msg)
                 raise Exception(f"Token approval failed: {error_msg}")
             
-            print(f"[SOROBAN] ✓ Admin approved successfully")
+            logger.info("[SOROBAN] ✓ Admin approved successfully")
             return True
             
         except Exception as e:
-            print(f"[SOROBAN] ERROR: Exception in token approval: {type(e).__name__}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error("[SOROBAN] Exception in token approval: %s: %s", type(e).__name__, e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
             raise
     
     def check_allowance(
@@ -519,66 +783,44 @@ class SorobanService:
         """
         Check the allowance (how much spender can transfer on behalf of owner)
         """
-        print(f"[SOROBAN] Checking allowance...")
-        print(f"[SOROBAN] Token: {token_contract_id}")
-        print(f"[SOROBAN] Owner: {owner_address}")
-        print(f"[SOROBAN] Spender: {spender_address}")
+        logger.debug("[SOROBAN] Checking allowance...")
+        logger.debug("[SOROBAN] Token: %s", token_contract_id)
+        logger.debug("[SOROBAN] Owner: %s", owner_address)
+        logger.debug("[SOROBAN] Spender: %s", spender_address)
         
         try:
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", token_contract_id,
-                "--source", "admin",
-                "--network", self.network,
+            cmd = self._base_invoke_cmd(token_contract_id) + [
                 "--",
                 "allowance",
                 "--from", owner_address,
                 "--spender", spender_address
             ]
             
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            if self.rpc_url:
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
             result = subprocess.run(
                 cmd,
+                close_fds=False,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
                 errors='replace',
-                env=env
+                env=self._cli_env
             )
             
             if result.returncode == 0:
                 output = result.stdout.strip()
-                print(f"[SOROBAN] Allowance output: {output}")
-                # Try to extract number from output
+                logger.debug("[SOROBAN] Allowance output: %s", output)
+                # The invoke result is printed as JSON; i128 comes back as a quoted string
                 try:
-                    import re
-                    numbers = re.findall(r'\d+', output)
-                    if numbers:
-                        allowance = int(numbers[-1])
-                        print(f"[SOROBAN] Current allowance: {allowance} stroops")
-                        return allowance
-                except:
-                    pass
-                return None
+                    allowance = int(json.loads(output))
+                except (ValueError, TypeError):
+                    return None
+                logger.debug("[SOROBAN] Current allowance: %s stroops", allowance)
+                return allowance
             else:
-                print(f"[SOROBAN] Allowance check failed: {result.stderr}")
+                logger.error("[SOROBAN] Allowance check failed: %s", result.stderr)
                 return None
         except Exception as e:
-            print(f"[SOROBAN] Error checking allowance: {e}")
+            logger.error("[SOROBAN] Error checking allowance: %s", e)
             return None
     
     def transfer_tokens_via_contract(
@@ -592,46 +834,45 @@ class SorobanService:
         Transfer tokens using token contract's transfer_from method.
         This requires the from_address to have approved the admin (spender) first.
         """
-        print(f"[SOROBAN] ===== TOKEN TRANSFER REQUEST ======")
-        print(f"[SOROBAN] Token Contract: {token_contract_id}")
-        print(f"[SOROBAN] From: {from_address}")
-        print(f"[SOROBAN] To: {to_address}")
-        print(f"[SOROBAN] Amount: {amount_i128} (smallest units)")
+        logger.debug("[SOROBAN] ===== TOKEN TRANSFER REQUEST ======")
+        logger.debug("[SOROBAN] Token Contract: %s", token_contract_id)
+        logger.debug("[SOROBAN] From: %s", from_address)
+        logger.debug("[SOROBAN] To: %s", to_address)
+        logger.debug("[SOROBAN] Amount: %s (smallest units)", amount_i128)
         
         admin_address = self.get_admin_address()
-        print(f"[SOROBAN] Admin address (spender): {admin_address}")
-        
-        # Check allowance first
-        print(f"[SOROBAN] Checking current allowance...")
-        current_allowance = self.check_allowance(
-            token_contract_id=token_contract_id,
-            owner_address=from_address,
-            spender_address=admin_address
-        )
-        
-        if current_allowance is not None:
-            if current_allowance < amount_i128:
-                print(f"[SOROBAN] ERROR: Insufficient allowance!")
-                print(f"[SOROBAN] Current: {current_allowance} stroops, Needed: {amount_i128} stroops")
-                raise Exception(
-                    f"Insufficient allowance. Current: {current_allowance} stroops, "
-                    f"Needed: {amount_i128} stroops. Admin must be approved for more tokens."
-                )
-            else:
-                print(f"[SOROBAN] ✓ Allowance sufficient: {current_allowance} >= {amount_i128}")
-        else:
-            print(f"[SOROBAN] Could not check allowance, proceeding anyway...")
+        logger.debug("[SOROBAN] Admin address (spender): %s", admin_address)
         
-        # Try transfer_from (requires approval)
+        # Try transfer_from (requires approval). No separate allowance read: the
+        # simulation that prepares the transaction fails the same way when it's short
         try:
-            print(f"[SOROBAN] Attempting transfer_from...")
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", token_contract_id,
-                "--source", "admin",
-                "--network", self.network,
+            logger.debug("[SOROBAN] Attempting transfer_from...")
+            if self.soroban_server:
+                try:
+                    self._invoke_contract(
+                        token_contract_id,
+                        "transfer_from",
+                        [
+                            scval.to_address(admin_address),
+                            scval.to_address(from_address),
+                            scval.to_address(to_address),
+                            scval.to_int128(amount_i128),
+                        ]
+                    )
+                except PrepareTransactionException as e:
+                    simulation_error = e.simulate_transaction_response.error or ""
+                    if "allowance" in simulation_error.lower():
+                        logger.error("[SOROBAN] Insufficient allowance! Needed: %s stroops", amount_i128)
+                        raise Exception(
+                            f"Insufficient allowance. Needed: {amount_i128} stroops. "
+                            f"Admin must be approved for more tokens. Error: {simulation_error}"
+                        ) from e
+                    raise
+                self._forget_balances(token_contract_id, from_address, to_address)
+                logger.info("[SOROBAN] ✓ Token transfer successful via transfer_from")
+                return True
+            
+            cmd = self._base_invoke_cmd(token_contract_id) + [
                 "--",
                 "transfer_from",
                 "--spender", admin_address,
@@ -640,38 +881,32 @@ class SorobanService:
                 "--amount", str(amount_i128)
             ]
             
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            if self.rpc_url:
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
-            print(f"[SOROBAN] Executing command: {' '.join(cmd)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[SOROBAN] Executing command: %s", redacted_argv(cmd))
             result = subprocess.run(
                 cmd,
+                close_fds=False,
                 capture_output=True,
                 text=True,
                 encoding='utf-8',
                 errors='replace',
-                env=env
+                env=self._cli_env
             )
             
-            print(f"[SOROBAN] Command return code: {result.returncode}")
-            print(f"[SOROBAN] Command stdout: {result.stdout}")
+            logger.debug("[SOROBAN] Command return code: %s", result.returncode)
+            logger.debug("[SOROBAN] Command stdout: %s", result.stdout)
             if result.stderr:
-                print(f"[SOROBAN] Command stderr: {result.stderr}")
+                logger.debug("[SOROBAN] Command stderr: %s", result.stderr)
             
             if result.returncode != 0:
                 error_msg = result.stderr or result.stdout
-                print(f"[SOROBAN] transfer_from failed: {error_msg}")
-                print(f"[SOROBAN] This likely means seller hasn't approved admin. Trying alternative approach...")
+                logger.error("[SOROBAN] transfer_from failed: %s", error_msg)
+                if "allowance" in error_msg.lower():
+                    raise Exception(
+                        f"Insufficient allowance. Needed: {amount_i128} stroops. "
+                        f"Admin must be approved for more tokens. Error: {error_msg}"
+                    )
+                logger.warning("[SOROBAN] This likely means seller hasn't approved admin. Trying alternative approach...")
                 
                 # Alternative: Use transfer method which requires seller to sign
                 # For now, we'll raise an error with clear message
@@ -681,13 +916,13 @@ class SorobanService:
                     f"Error: {error_msg}"
                 )
             
-            print(f"[SOROBAN] ✓ Token transfer successful via transfer_from")
+            self._forget_balances(token_contract_id, from_address, to_address)
+            logger.info("[SOROBAN] ✓ Token transfer successful via transfer_from")
             return True
             
         except Exception as e:
-            print(f"[SOROBAN] ERROR: Exception in token transfer: {type(e).__name__}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error("[SOROBAN] Exception in token transfer: %s: %s", type(e).__name__, e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
             raise
     
     def get_token_balance(
@@ -699,123 +934,157 @@ class SorobanService:
         Get token balance for an address.
         Returns balance in smallest units (stroops).
         """
-        try:
-            cmd = [
-                "stellar",
-                "contract",
-                "invoke",
-                "--id", token_contract_id,
-                "--source", "admin",
-                "--network", self.network,
-                "--",
-                "balance",
-                "--id", address
-            ]
-            
-            env = os.environ.copy()
-            env["STELLAR_SECRET_KEY"] = self.admin_secret
-            
-            if self.rpc_url:
-                network_idx = cmd.index("--network")
-                cmd.insert(network_idx, "--rpc-url")
-                cmd.insert(network_idx + 1, self.rpc_url)
-                cmd.insert(network_idx + 2, "--network-passphrase")
-                cmd.insert(network_idx + 3, self.network_passphrase)
-            
-            if self.network_passphrase:
-                env["STELLAR_NETWORK_PASSPHRASE"] = self.network_passphrase
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='replace',
-                env=env
-            )
+        key = (token_contract_id, address)
+        with self._balance_cache_lock:
+            if key in self._balance_cache:
+                return self._balance_cache[key]
+            fetch_lock = self._balance_fetch_locks.setdefault(key, threading.Lock())
+        
+        with fetch_lock:
+            # Another caller may have fetched it while we waited
+            with self._balance_cache_lock:
+                if key in self._balance_cache:
+                    return self._balance_cache[key]
             
-            if result.returncode == 0:
-                output = result.stdout.strip()
-                try:
-                    import re
-                    numbers = re.findall(r'\d+', output)
-                    if numbers:
-                        balance = int(numbers[-1])
-                        return balance
-                except:
-                    pass
+            balance = self._fetch_token_balance(token_contract_id, address)
+            with self._balance_cache_lock:
+                if balance is not None:
+                    self._balance_cache[key] = balance
+                self._balance_fetch_locks.pop(key, None)
+            return balance
+    
+    def _forget_balances(self, token_contract_id: str, *addresses):
+        """Drop cached balances that a transfer just changed"""
+        with self._balance_cache_lock:
+            for address in addresses:
+                self._balance_cache.pop((token_contract_id, address), None)
+    
+    def _fetch_token_balance(self, token_contract_id: str, address: str):
+        """Uncached balance lookup (stroops), or None on failure"""
+        if not self.read_server:
+            logger.error("[SOROBAN] No RPC endpoint for %s; set STELLAR_RPC_URL to read balances", self.network)
             return None
+        try:
+            # A read-only call only needs simulating; the source's sequence is never checked,
+            # so a placeholder account avoids a load_account round trip
+            tx = (
+                TransactionBuilder(Account(self.admin_address, 0), self.network_passphrase, base_fee=100)
+                .set_timeout(30)
+                .append_invoke_contract_function_op(token_contract_id, "balance", [scval.to_address(address)])
+                .build()
+            )
+            simulation = self.read_server.simulate_transaction(tx)
+            if simulation.error or not simulation.results:
+                logger.warning("[SOROBAN] Balance simulation failed: %s", simulation.error)
+                return None
+            return scval.from_int128(simulation.results[0].xdr)
         except Exception as e:
-            print(f"[SOROBAN] Error getting token balance: {e}")
+            logger.error("[SOROBAN] Error getting token balance: %s", e)
             return None
     
+    def _rpc_submit_allowed(self):
+        """False while the breaker is open (the RPC node recently kept failing)"""
+        with self._rpc_breaker_lock:
+            if time.monotonic() < self._rpc_open_until:
+                self._rpc_submissions["skipped"] += 1
+                return False
+            return True
+    
+    def _record_rpc_submit(self, ok: bool):
+        with self._rpc_breaker_lock:
+            if ok:
+                self._rpc_submissions["ok"] += 1
+                self._rpc_failures = 0
+                return
+            self._rpc_submissions["failed"] += 1
+            self._rpc_failures += 1
+            if self._rpc_failures >= RPC_BREAKER_THRESHOLD:
+                self._rpc_open_until = time.monotonic() + RPC_BREAKER_COOLDOWN
+                self._rpc_failures = 0
+                logger.warning("[SOROBAN] RPC submissions keep failing; using Horizon only for %ss", RPC_BREAKER_COOLDOWN)
+    
+    def rpc_health(self):
+        """RPC submission counters and success ratio, for monitoring"""
+        with self._rpc_breaker_lock:
+            stats = dict(self._rpc_submissions)
+            breaker_open = time.monotonic() < self._rpc_open_until
+        attempted = stats["ok"] + stats["failed"]
+        stats["success_ratio"] = stats["ok"] / attempted if attempted else None
+        stats["breaker_open"] = breaker_open
+        return stats
+    
     def submit_signed_transaction(self, signed_xdr: str):
         """
         Submit a signed Soroban transaction XDR.
         Uses RPC if available, falls back to Horizon.
         """
         try:
-            import requests
-            
             # Try RPC first (preferred for Soroban transactions)
-            if self.rpc_url:
+            if self.rpc_url and self._rpc_submit_allowed():
                 try:
-                    print(f"[SOROBAN] Submitting signed transaction via RPC...")
-                    rpc_response = requests.post(
+                    logger.debug("[SOROBAN] Submitting signed transaction via RPC...")
+                    rpc_response = self.submit_http.post(
                         self.rpc_url,
-                        json={
-                            "jsonrpc": "2.0",
-                            "id": 1,
-                            "method": "sendTransaction",
-                            "params": {
-                                "transaction": signed_xdr
-                            }
-                        },
-                        timeout=30
+                        json={**SEND_TRANSACTION_REQUEST, "params": {"transaction": signed_xdr}},
+                        timeout=(self.connect_timeout, self.read_timeout)
                     )
                     if rpc_response.status_code == 200:
-                        rpc_data = rpc_response.json()
-                        if "result" in rpc_data and "transactionHash" in rpc_data["result"]:
-                            tx_hash = rpc_data["result"]["transactionHash"]
-                            print(f"[SOROBAN] ✓ Transaction submitted via RPC: {tx_hash}")
+                        rpc_data = orjson.loads(rpc_response.content)
+                        result = rpc_data.get("result") or {}
+                        status = result.get("status")
+                        # Any verdict from core means the node itself is healthy
+                        self._record_rpc_submit(status in ("PENDING", "DUPLICATE", "ERROR", "TRY_AGAIN_LATER"))
+                        if status in ("PENDING", "DUPLICATE"):
+                            tx_hash = result.get("hash") or result.get("transactionHash")
+                            logger.info("[SOROBAN] ✓ Transaction submitted via RPC: %s", tx_hash)
                             return tx_hash
+                        elif status == "ERROR":
+                            # Core rejected it outright (bad seq, bad auth, fee too low, ...).
+                            # Horizon submits to the same core, so retrying there can only fail again
+                            result_code = transaction_result_code(result.get("errorResultXdr"))
+                            logger.error("[SOROBAN] RPC rejected transaction: %s", result_code)
+                            raise SubmissionRejectedError(f"Transaction rejected by the network: {result_code}")
                         elif "error" in rpc_data:
                             error_info = rpc_data["error"]
-                            print(f"[SOROBAN] RPC submission failed: {error_info}")
+                            logger.warning("[SOROBAN] RPC submission failed: %s", error_info)
                             # Continue to Horizon fallback
                         else:
-                            print(f"[SOROBAN] Unexpected RPC response: {rpc_data}")
+                            logger.warning("[SOROBAN] Unexpected RPC response: %s", rpc_data)
                             # Continue to Horizon fallback
+                    else:
+                        self._record_rpc_submit(False)
+                        logger.warning("[SOROBAN] RPC returned HTTP %s", rpc_response.status_code)
+                except SubmissionRejectedError:
+                    raise
                 except Exception as rpc_error:
-                    print(f"[SOROBAN] RPC submission error: {rpc_error}")
+                    self._record_rpc_submit(False)
+                    logger.warning("[SOROBAN] RPC submission error: %s", rpc_error)
                     # Continue to Horizon fallback
             
             # Fallback to Horizon
-            print(f"[SOROBAN] Trying Horizon submission...")
-            horizon_url = "https://horizon-testnet.stellar.org" if self.network == "testnet" else "https://horizon.stellar.org"
-            response = requests.post(
-                f'{horizon_url}/transactions',
-                headers={'Content-Type': 'application/x-www-form-urlencoded'},
-                data=f'tx={requests.utils.quote(signed_xdr)}',
-                timeout=30
+            logger.debug("[SOROBAN] Trying Horizon submission...")
+            # requests form-encodes the dict and sets the urlencoded Content-Type itself
+            response = self.submit_http.post(
+                f'{self.horizon_url}/transactions',
+                data={'tx': signed_xdr},
+                timeout=(self.connect_timeout, self.read_timeout)
             )
             
             if response.ok:
-                result = response.json()
+                result = orjson.loads(response.content)
                 transaction_hash = result.get('hash')
                 if transaction_hash:
-                    print(f"[SOROBAN] ✓ Transaction submitted via Horizon: {transaction_hash}")
+                    logger.info("[SOROBAN] ✓ Transaction submitted via Horizon: %s", transaction_hash)
                     return transaction_hash
                 else:
                     raise Exception(f"Horizon submission succeeded but no hash in response: {result}")
             else:
                 error_text = response.text
-                print(f"[SOROBAN] Horizon submission failed: {error_text}")
+                logger.error("[SOROBAN] Horizon submission failed: %s", error_text)
                 raise Exception(f"Transaction submission failed: {error_text}")
                 
         except Exception as e:
-            print(f"[SOROBAN] Error submitting transaction: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.error("[SOROBAN] Error submitting transaction: %s", e,
+                         exc_info=logger.isEnabledFor(logging.DEBUG))
             raise
 